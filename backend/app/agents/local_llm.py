@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, AsyncGenerator, Dict
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from app.agents.routing import CHARS_PER_TOKEN
+
+STREAM_CHUNK_CHARS = 64
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def instruction_text(system_instruction: Any) -> str:
+    if system_instruction is None:
+        return ""
+    if isinstance(system_instruction, str):
+        return system_instruction
+    parts = getattr(system_instruction, "parts", None) or []
+    return "".join(part.text or "" for part in parts)
+
+
+def _field(prompt: str, label: str, default: str) -> str:
+    match = re.search(rf"^{re.escape(label)}: (.+)$", prompt, re.MULTILINE)
+    return match.group(1).strip() if match else default
+
+
+def _component() -> Dict[str, Any]:
+    return {
+        "score": 50,
+        "confidence": 0.5,
+        "signal": "neutral",
+        "highlights": ["Local stand-in highlight.", "Local stand-in highlight."],
+    }
+
+
+def _sample_response(schema: Any, prompt: str) -> str:
+    ticker = _field(prompt, "Ticker", "UNKNOWN")
+    as_of = _field(prompt, "As Of (UTC)", "")
+    reasons = ["Local stand-in reason."] * 3
+    risks = ["Local stand-in risk."]
+    name = getattr(schema, "__name__", "")
+    if name == "Scorecard":
+        payload: Dict[str, Any] = {
+            "score": 50,
+            "short_term": "Not Buy",
+            "mid_term": "Not Buy",
+            "long_term": "Not Buy",
+            "rationale": "Local stand-in response.",
+        }
+    elif name == "TechnicalScorecard":
+        timeframe = {"trend": "sideways", "notes": "Local stand-in."}
+        payload = {
+            "agent": "technical",
+            "ticker": ticker,
+            "as_of": as_of,
+            "score": 50,
+            "confidence": 0.5,
+            "signal": "neutral",
+            "timeframes": {
+                "short_term": timeframe,
+                "medium_term": timeframe,
+                "long_term": timeframe,
+            },
+            "key_levels": {"support": [0.0, 0.0], "resistance": [0.0, 0.0]},
+            "reasons": reasons,
+            "risks": risks,
+        }
+    elif name == "FundamentalScorecard":
+        payload = {
+            "agent": "fundamental",
+            "ticker": ticker,
+            "as_of": as_of,
+            "score": 50,
+            "confidence": 0.5,
+            "signal": "neutral",
+            "quality": {
+                "profitability": 50,
+                "growth": 50,
+                "balance_sheet": 50,
+                "cash_flow": 50,
+                "valuation": 50,
+            },
+            "reasons": reasons,
+            "risks": risks,
+        }
+    elif name == "CompilerScorecard":
+        payload = {
+            "ticker": ticker,
+            "as_of": as_of,
+            "weights": {"technical": 0.45, "fundamental": 0.55},
+            "final_score": 50,
+            "final_confidence": 0.5,
+            "final_signal": "neutral",
+            "components": {"technical": _component(), "fundamental": _component()},
+            "top_reasons": reasons[:2],
+            "key_risks": risks,
+        }
+    else:
+        headings = re.findall(r"^## .+$", prompt, re.MULTILINE) or ["## Report"]
+        return "\n\n".join(f"{heading}\nLocal stand-in content." for heading in headings)
+    return json.dumps(payload)
+
+
+class LocalLlm(BaseLlm):
+    model: str = "local"
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"local.*"]
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        config = llm_request.config
+        system = instruction_text(config.system_instruction if config else None)
+        prompt = "\n".join(
+            part.text or ""
+            for content in llm_request.contents
+            for part in content.parts or []
+        )
+        text = _sample_response(
+            config.response_schema if config else None, f"{system}\n{prompt}"
+        )
+
+        prompt_tokens = estimate_tokens(system) + estimate_tokens(prompt)
+        output_tokens = estimate_tokens(text)
+        if stream:
+            for offset in range(0, len(text), STREAM_CHUNK_CHARS):
+                chunk = text[offset : offset + STREAM_CHUNK_CHARS]
+                yield LlmResponse(
+                    content=types.Content(role="model", parts=[types.Part(text=chunk)]),
+                    partial=True,
+                )
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=output_tokens,
+                total_token_count=prompt_tokens + output_tokens,
+            ),
+        )
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import (
+    DATA_DIR,
+    MATERIALITY_ENABLED,
+    MATERIALITY_MAX_AGE_HOURS,
+    MATERIALITY_THRESHOLDS,
+)
+
+STORE_DIR = DATA_DIR / "analyses"
+
+# A change is material when |new - old| > threshold * max(1, |old|): relative for
+# prices and volumes, absolute for returns and ratios below 1. Unlisted fields
+# use 0, so any change to them is material.
+DEFAULT_THRESHOLDS = {
+    "first_close": 0.02,
+    "last_close": 0.02,
+    "return_1m": 0.02,
+    "return_3m": 0.03,
+    "return_6m": 0.04,
+    "volatility_annualized": 0.02,
+    "max_drawdown": 0.01,
+    "avg_daily_volume": 0.25,
+    "pe_ratio": 0.05,
+    "market_cap": 0.05,
+}
+
+AGENT_INPUTS = {
+    "analysis_agent": ("company", "price", "metrics"),
+    "score_agent": ("company", "price", "metrics"),
+    "technical_agent": ("price", "metrics"),
+    "fundamental_agent": ("company", "financials", "metrics"),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def load_thresholds(raw: str = MATERIALITY_THRESHOLDS) -> Dict[str, float]:
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    if not raw:
+        return thresholds
+    try:
+        overrides = json.loads(raw)
+        thresholds.update({str(k): float(v) for k, v in overrides.items()})
+    except (AttributeError, TypeError, ValueError):
+        logger.error("MATERIALITY_THRESHOLDS is not a JSON object of numbers; ignoring.")
+    return thresholds
+
+
+THRESHOLDS = load_thresholds()
+
+
+def build_features(
+    company: Dict[str, Any],
+    aggregates: List[Dict[str, Any]],
+    metrics: Dict[str, Any],
+    financials: Optional[Dict[str, Any]],
+) -> Dict[str, Dict[str, Any]]:
+    price: Dict[str, Any] = {}
+    if aggregates:
+        price = {
+            "first_close": aggregates[0].get("c"),
+            "last_close": aggregates[-1].get("c"),
+        }
+    return {
+        "company": dict(company or {}),
+        "price": price,
+        "metrics": dict(metrics or {}),
+        "financials": dict(financials or {}),
+    }
+
+
+def agent_inputs(features: Dict[str, Dict[str, Any]], name: str) -> Dict[str, Any]:
+    return {
+        f"{group}.{field}": value
+        for group in AGENT_INPUTS[name]
+        for field, value in features[group].items()
+    }
+
+
+def _threshold(key: str, thresholds: Dict[str, float]) -> float:
+    if key in thresholds:
+        return thresholds[key]
+    return thresholds.get(key.rsplit(".", 1)[-1], 0.0)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def material_changes(
+    previous: Dict[str, Any],
+    current: Dict[str, Any],
+    thresholds: Optional[Dict[str, float]] = None,
+) -> List[str]:
+    thresholds = THRESHOLDS if thresholds is None else thresholds
+    changed: List[str] = []
+    for key in sorted(set(previous) | set(current)):
+        old, new = previous.get(key), current.get(key)
+        if _is_number(old) and _is_number(new):
+            if math.isnan(old) and math.isnan(new):
+                continue
+            limit = _threshold(key, thresholds) * max(1.0, abs(old))
+            if not abs(new - old) <= limit:
+                changed.append(key)
+        elif old != new:
+            changed.append(key)
+    return changed
+
+
+def _store_path(ticker: str) -> Path:
+    return STORE_DIR / f"{ticker.upper()}.json"
+
+
+def load_record(ticker: str) -> Dict[str, Any]:
+    path = _store_path(ticker)
+    if not MATERIALITY_ENABLED or not path.exists():
+        return {"agents": {}}
+    try:
+        return json.loads(path.read_text())
+    except (OSError, json.JSONDecodeError):
+        logger.warning("Analysis record for %s is unreadable; rerunning agents.", ticker)
+        return {"agents": {}}
+
+
+def save_record(ticker: str, record: Dict[str, Any]) -> None:
+    if not MATERIALITY_ENABLED:
+        return
+    path = _store_path(ticker)
+    try:
+        STORE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(record, ensure_ascii=True, separators=(",", ":")))
+        tmp_path.replace(path)
+    except OSError as exc:
+        logger.warning("Could not store analysis record for %s: %s", ticker, exc)
+
+
+def carried_output(
+    record: Dict[str, Any], name: str, inputs: Dict[str, Any], now: datetime
+) -> Optional[Any]:
+    entry = record["agents"].get(name)
+    if not MATERIALITY_ENABLED or not entry or entry.get("output") is None:
+        return None
+    try:
+        age = now - datetime.fromisoformat(entry["as_of"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if age > timedelta(hours=MATERIALITY_MAX_AGE_HOURS):
+        return None
+    changed = material_changes(entry.get("inputs") or {}, inputs)
+    if changed:
+        logger.info("Agent %s inputs changed: %s", name, ", ".join(changed[:5]))
+        return None
+    return entry["output"]
+
+
+def remember(
+    record: Dict[str, Any], name: str, inputs: Dict[str, Any], output: Any, as_of: str
+) -> None:
+    record["agents"][name] = {"inputs": inputs, "output": output, "as_of": as_of}
+
+
+def output_stamp(record: Dict[str, Any], name: str) -> Optional[str]:
+    entry = record["agents"].get(name)
+    return entry.get("as_of") if entry else None
@@ -1,24 +1,51 @@
 from __future__ import annotations
 
+import asyncio
+from contextvars import ContextVar
 import json
 from datetime import datetime, timezone
 import logging
 import time
-from typing import Any, Dict, List, Optional, Type, TYPE_CHECKING
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from google.adk.agents import Agent
     from app.services.polygon import PolygonData
 from pydantic import BaseModel, ValidationError
 
+from app.agents.materiality import (
+    agent_inputs,
+    build_features,
+    carried_output,
+    load_record,
+    output_stamp,
+    remember,
+    save_record,
+)
 from app.agents.prompts import (
+    AGENT_INSTRUCTIONS,
     ANALYSIS_PROMPT,
     COMPILER_PROMPT,
     FUNDAMENTAL_PROMPT,
     SCORE_PROMPT,
     TECHNICAL_PROMPT,
 )
-from app.core.config import GEMINI_API_KEY
+from app.agents.routing import (
+    CHARS_PER_TOKEN,
+    AgentRoute,
+    agent_latency,
+    get_route,
+    hedge_budget,
+)
+from app.core.config import AGENT_BACKEND, GEMINI_API_KEY
+from app.core.deadline import (
+    DeadlineExceededError,
+    deadline_scope,
+    expired,
+    remaining,
+    stage_timeout,
+)
+from app.core.profiling import profile_stage, profiled_to_thread
 from app.models.schemas import (
     CompilerScorecard,
     FundamentalScorecard,
@@ -33,42 +60,88 @@ class GeminiError(Exception):
 
 logger = logging.getLogger(__name__)
 
+AGENT_USER_ID = "stockiq"
+
+PartialListener = Callable[[str, str], None]
+
+_agent_usage: ContextVar[Optional[Dict[str, Dict[str, int]]]] = ContextVar(
+    "agent_usage", default=None
+)
+_partial_listener: ContextVar[Optional[PartialListener]] = ContextVar(
+    "partial_listener", default=None
+)
+
+
+def _static_instruction(text: str) -> Callable[[Any], str]:
+    # Instruction providers bypass ADK's {state} templating, which would trip on
+    # the JSON schema braces in the prompts.
+    return lambda _context: text
+
+
+def _build_agent(
+    name: str,
+    output_schema: Optional[Type[BaseModel]] = None,
+    model: Optional[str] = None,
+    retry_attempts: int = 5,
+    max_output_tokens: Optional[int] = None,
+    max_retry_delay: Optional[float] = None,
+) -> "Agent":
+    from google.adk.agents import Agent
+    from google.genai import types
+
+    model = model or get_route(name).model
+    generate_config = types.GenerateContentConfig(max_output_tokens=max_output_tokens)
+    instruction = _static_instruction(
+        AGENT_INSTRUCTIONS.get(name, "Follow the system prompt exactly.")
+    )
+
+    if AGENT_BACKEND == "local":
+        from app.agents.local_llm import LocalLlm
+
+        return Agent(
+            name=name,
+            model=LocalLlm(model=f"local/{model}"),
+            description="Single-stock investor-style analysis agent.",
+            instruction=instruction,
+            output_schema=output_schema,
+            generate_content_config=generate_config,
+        )
 
-def _build_agent(name: str, output_schema: Optional[Type[BaseModel]] = None) -> "Agent":
     if not GEMINI_API_KEY:
         raise GeminiError("GEMINI_API_KEY is not set.")
 
-    from google.adk.agents import Agent
     from google.adk.models.google_llm import Gemini
-    from google.genai import types
 
     retry_config = types.HttpRetryOptions(
-        attempts=5,
+        attempts=retry_attempts,
         exp_base=7,
         initial_delay=1,
+        max_delay=max_retry_delay,
         http_status_codes=[429, 500, 503, 504],
     )
 
     return Agent(
         name=name,
         model=Gemini(
-            model="gemini-2.5-flash-lite",
+            model=model,
             retry_options=retry_config,
         ),
         description="Single-stock investor-style analysis agent.",
-        instruction="Follow the system prompt exactly.",
+        instruction=instruction,
         output_schema=output_schema,
+        generate_content_config=generate_config,
     )
 
 
-def _content_to_text(content: Any | None) -> str:
+def _content_to_text(content: Any | None, strip: bool = True) -> str:
     if not content or not content.parts:
         return ""
     parts: List[str] = []
     for part in content.parts:
         if part.text:
             parts.append(part.text)
-    return "".join(parts).strip()
+    text = "".join(parts)
+    return text.strip() if strip else text
 
 
 def _truncate_text(text: str, limit: int = 2000) -> str:
@@ -77,13 +150,18 @@ def _truncate_text(text: str, limit: int = 2000) -> str:
     return f"{text[:limit]}...[truncated]"
 
 
-def _extract_final_text(events: List[Any]) -> str:
-    for event in reversed(events):
-        if getattr(event, "author", "") != "user" and event.is_final_response():
-            text = _content_to_text(event.content)
-            if text:
-                return text
-    return ""
+def _record_usage(name: str, metadata: Any | None) -> None:
+    usage = _agent_usage.get()
+    if usage is None or metadata is None:
+        return
+    prompt_tokens = metadata.prompt_token_count or 0
+    cached_tokens = metadata.cached_content_token_count or 0
+    usage[name] = {
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "uncached_tokens": prompt_tokens - cached_tokens,
+        "output_tokens": metadata.candidates_token_count or 0,
+    }
 
 
 def _format_timestamp(ts: Any) -> str:
@@ -122,31 +200,167 @@ def _normalize_price_data(price_data: List[Dict[str, Any]]) -> List[Dict[str, An
     return normalized
 
 
-async def _run_agent(
+async def _call_agent(
     prompt: str,
     name: str,
+    model: str,
+    route: AgentRoute,
     output_schema: Optional[Type[BaseModel]] = None,
 ) -> str:
     start = time.perf_counter()
-    logger.info("Agent start: %s", name)
-    agent = _build_agent(name, output_schema=output_schema)
+    agent = _build_agent(
+        name,
+        output_schema=output_schema,
+        model=model,
+        retry_attempts=route.retry_attempts,
+        max_output_tokens=route.max_output_tokens,
+        max_retry_delay=remaining(),
+    )
+    from google.adk.agents.run_config import RunConfig, StreamingMode
     from google.adk.runners import InMemoryRunner
+    from google.genai import types
 
     runner = InMemoryRunner(agent=agent)
+    session = await runner.session_service.create_session(
+        app_name=runner.app_name, user_id=AGENT_USER_ID
+    )
+    listener = _partial_listener.get()
+    events = runner.run_async(
+        user_id=AGENT_USER_ID,
+        session_id=session.id,
+        new_message=types.Content(role="user", parts=[types.Part(text=prompt)]),
+        run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+    )
+    response_text = ""
+    usage_metadata = None
+    streamed_chars = 0
     try:
-        events = await runner.run_debug(prompt, quiet=True)
-        response_text = _extract_final_text(events)
-        if not response_text:
-            raise GeminiError("Gemini did not return a usable response.")
-        logger.info(
-            "Agent done: %s (%.2fs)", name, time.perf_counter() - start
-        )
-        return response_text
-    except Exception as exc:
-        logger.exception(
-            "Agent failed: %s (%.2fs)", name, time.perf_counter() - start
+        async for event in events:
+            if getattr(event, "author", "") == "user":
+                continue
+            if event.usage_metadata is not None:
+                usage_metadata = event.usage_metadata
+            if event.partial:
+                chunk = _content_to_text(event.content, strip=False)
+                streamed_chars += len(chunk)
+                if streamed_chars // CHARS_PER_TOKEN > route.max_output_tokens:
+                    raise GeminiError(
+                        f"{name} exceeded its {route.max_output_tokens} output token cap."
+                    )
+                if chunk and listener is not None:
+                    listener(name, chunk)
+                continue
+            if event.is_final_response():
+                response_text = _content_to_text(event.content) or response_text
+    finally:
+        await events.aclose()
+
+    if not response_text:
+        raise GeminiError("Gemini did not return a usable response.")
+    # Validate here so a malformed answer counts as a failed attempt and a
+    # concurrent hedge can still win.
+    if output_schema is not None:
+        try:
+            output_schema.model_validate_json(_extract_json_object(response_text))
+        except ValidationError as exc:
+            raise GeminiError(
+                f"{name} returned invalid {output_schema.__name__} JSON."
+            ) from exc
+    agent_latency.record(name, time.perf_counter() - start)
+    _record_usage(name, usage_metadata)
+    return response_text
+
+
+async def _run_hedged(
+    prompt: str,
+    name: str,
+    model: str,
+    route: AgentRoute,
+    output_schema: Optional[Type[BaseModel]] = None,
+) -> str:
+    timeout = stage_timeout(route.timeout, name)
+    deadline = time.perf_counter() + timeout
+
+    def launch() -> "asyncio.Task[str]":
+        return asyncio.create_task(
+            _call_agent(prompt, name, model, route, output_schema=output_schema)
         )
-        raise exc
+
+    hedge_budget.record_call()
+    pending = {launch()}
+    # Streamed calls are not hedged so listeners see a single stream of text.
+    hedge = route.hedge and _partial_listener.get() is None
+    hedge_after = agent_latency.percentile(name) if hedge else None
+    try:
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = await asyncio.wait(pending, timeout=hedge_after)
+            if not done and hedge_budget.try_acquire():
+                logger.info("Agent hedged: %s after %.2fs", name, hedge_after)
+                pending.add(launch())
+
+        error: Optional[BaseException] = None
+        while pending:
+            time_left = deadline - time.perf_counter()
+            if time_left <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=time_left, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        if error is not None and not pending:
+            raise error
+        if expired():
+            raise DeadlineExceededError(f"Deadline reached while {name} was running.")
+        raise GeminiError(f"{name} timed out after {route.timeout:.0f}s on {model}.")
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _run_agent(
+    prompt: str,
+    name: str,
+    output_schema: Optional[Type[BaseModel]] = None,
+) -> str:
+    start = time.perf_counter()
+    route = get_route(name)
+    logger.info("Agent start: %s (%s)", name, route.model)
+    with profile_stage(f"agent:{name}"):
+        try:
+            try:
+                response_text = await _run_hedged(
+                    prompt, name, route.model, route, output_schema=output_schema
+                )
+            except Exception as exc:
+                if not route.fallback_model or isinstance(exc, DeadlineExceededError):
+                    raise
+                logger.warning(
+                    "Agent %s failed on %s (%s); falling back to %s",
+                    name,
+                    route.model,
+                    exc,
+                    route.fallback_model,
+                )
+                response_text = await _run_hedged(
+                    prompt, name, route.fallback_model, route, output_schema=output_schema
+                )
+            logger.info(
+                "Agent done: %s (%.2fs)", name, time.perf_counter() - start
+            )
+            return response_text
+        except DeadlineExceededError as exc:
+            logger.warning(
+                "Agent cut off: %s (%.2fs, %s)", name, time.perf_counter() - start, exc
+            )
+            raise
+        except Exception as exc:
+            logger.exception(
+                "Agent failed: %s (%.2fs)", name, time.perf_counter() - start
+            )
+            raise exc
 
 
 def _extract_json_object(text: str) -> str:
@@ -183,13 +397,14 @@ async def analyze_score(
     price_summary: str,
     metrics: Dict[str, Any],
 ) -> Dict[str, Any]:
-    prompt = SCORE_PROMPT.format(
-        ticker=ticker,
-        as_of=as_of,
-        company_json=json.dumps(company_json or {}, ensure_ascii=True),
-        price_summary=price_summary,
-        metrics_json=json.dumps(metrics or {}, ensure_ascii=True),
-    )
+    with profile_stage("prompt:score_agent"):
+        prompt = SCORE_PROMPT.format(
+            ticker=ticker,
+            as_of=as_of,
+            company_json=json.dumps(company_json or {}, ensure_ascii=True),
+            price_summary=price_summary,
+            metrics_json=json.dumps(metrics or {}, ensure_ascii=True),
+        )
     response = await _run_agent(prompt, "score_agent", output_schema=Scorecard)
     return _parse_scorecard(response)
 
@@ -248,12 +463,13 @@ async def analyze_technical(
     price_data: List[Dict[str, Any]],
     indicators: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
-    prompt = TECHNICAL_PROMPT.format(
-        ticker=ticker,
-        as_of=as_of,
-        price_data_json=json.dumps(_normalize_price_data(price_data), ensure_ascii=True),
-        indicators_json=json.dumps(indicators or {}, ensure_ascii=True),
-    )
+    with profile_stage("prompt:technical_agent"):
+        prompt = TECHNICAL_PROMPT.format(
+            ticker=ticker,
+            as_of=as_of,
+            price_data_json=json.dumps(_normalize_price_data(price_data), ensure_ascii=True),
+            indicators_json=json.dumps(indicators or {}, ensure_ascii=True),
+        )
     response = await _run_agent(prompt, "technical_agent", output_schema=TechnicalScorecard)
     return _parse_technical_scorecard(response)
 
@@ -265,13 +481,14 @@ async def analyze_fundamental(
     financials: Optional[Dict[str, Any]],
     metrics: Dict[str, Any],
 ) -> Dict[str, Any]:
-    prompt = FUNDAMENTAL_PROMPT.format(
-        ticker=ticker,
-        as_of=as_of,
-        company_json=json.dumps(company_json or {}, ensure_ascii=True),
-        financials_json=json.dumps(financials or {}, ensure_ascii=True),
-        metrics_json=json.dumps(metrics or {}, ensure_ascii=True),
-    )
+    with profile_stage("prompt:fundamental_agent"):
+        prompt = FUNDAMENTAL_PROMPT.format(
+            ticker=ticker,
+            as_of=as_of,
+            company_json=json.dumps(company_json or {}, ensure_ascii=True),
+            financials_json=json.dumps(financials or {}, ensure_ascii=True),
+            metrics_json=json.dumps(metrics or {}, ensure_ascii=True),
+        )
     response = await _run_agent(
         prompt, "fundamental_agent", output_schema=FundamentalScorecard
     )
@@ -285,64 +502,153 @@ async def analyze_compiler(
     fundamental_result: Dict[str, Any],
     weights: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
-    prompt = COMPILER_PROMPT.format(
-        ticker=ticker,
-        as_of=as_of,
-        technical_json=json.dumps(technical_result or {}, ensure_ascii=True),
-        fundamental_json=json.dumps(fundamental_result or {}, ensure_ascii=True),
-        weights_json=json.dumps(weights or {}, ensure_ascii=True),
-    )
+    with profile_stage("prompt:compiler_agent"):
+        prompt = COMPILER_PROMPT.format(
+            ticker=ticker,
+            as_of=as_of,
+            technical_json=json.dumps(technical_result or {}, ensure_ascii=True),
+            fundamental_json=json.dumps(fundamental_result or {}, ensure_ascii=True),
+            weights_json=json.dumps(weights or {}, ensure_ascii=True),
+        )
     response = await _run_agent(prompt, "compiler_agent", output_schema=CompilerScorecard)
     return _parse_compiler_scorecard(response)
 
 
-async def analyze_stock(ticker: str) -> Dict[str, Any]:
+def _expected_to_miss_deadline(name: str) -> bool:
+    left = remaining()
+    if left is None:
+        return False
+    typical = agent_latency.percentile(name, quantile=0.5)
+    return left <= 0 or (typical is not None and left < typical)
+
+
+async def analyze_stock(
+    ticker: str,
+    on_partial: Optional[PartialListener] = None,
+    deadline: Optional[float] = None,
+) -> Dict[str, Any]:
+    with deadline_scope(deadline):
+        return await _analyze_stock(ticker, on_partial)
+
+
+async def _analyze_stock(
+    ticker: str, on_partial: Optional[PartialListener]
+) -> Dict[str, Any]:
     overall_start = time.perf_counter()
     logger.info("Analyze start: %s", ticker)
+    usage: Dict[str, Dict[str, int]] = {}
+    _agent_usage.set(usage)
+    _partial_listener.set(on_partial)
     from app.services.metrics import compute_metrics
     from app.services.polygon import fetch_polygon_data
 
-    polygon_data: "PolygonData" = fetch_polygon_data(ticker)
-    metrics = compute_metrics(polygon_data.aggregates, polygon_data.financials)
-    as_of = datetime.now(timezone.utc).isoformat()
+    # Both run in worker threads so the event loop keeps serving other requests;
+    # the context is copied, so the deadline still applies and the profiler
+    # samples the worker too.
+    with profile_stage("polygon_fetch"):
+        polygon_data: "PolygonData" = await profiled_to_thread(fetch_polygon_data, ticker)
+    with profile_stage("compute_metrics"):
+        metrics = await profiled_to_thread(
+            compute_metrics, polygon_data.aggregates, polygon_data.financials
+        )
+    now = datetime.now(timezone.utc)
+    as_of = now.isoformat()
     price_summary = _format_price_summary(polygon_data.aggregates)
-
-    prompt = ANALYSIS_PROMPT.format(
-        ticker=ticker,
-        as_of=as_of,
-        company_json=json.dumps(polygon_data.company, ensure_ascii=True),
-        price_summary=price_summary,
-        metrics_json=json.dumps(metrics, ensure_ascii=True),
-    )
-
-    report_markdown = await _run_agent(prompt, "analysis_agent")
-    scorecard = await analyze_score(
-        ticker=ticker,
-        as_of=as_of,
-        company_json=polygon_data.company,
-        price_summary=price_summary,
-        metrics=metrics,
+    features = build_features(
+        polygon_data.company, polygon_data.aggregates, metrics, polygon_data.financials
     )
+    record = load_record(ticker)
+    carried_forward: List[str] = []
+    missing: List[str] = []
+
+    async def gated(
+        name: str, inputs: Dict[str, Any], run: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        output = carried_output(record, name, inputs, now)
+        if output is not None:
+            logger.info("Agent carried forward: %s", name)
+            carried_forward.append(name)
+            return output
+        if _expected_to_miss_deadline(name):
+            logger.warning("Agent skipped near deadline: %s", name)
+            missing.append(name)
+            return None
+        try:
+            output = await run()
+        except DeadlineExceededError:
+            missing.append(name)
+            return None
+        remember(record, name, inputs, output, as_of)
+        return output
+
+    async def run_analysis() -> str:
+        with profile_stage("prompt:analysis_agent"):
+            prompt = ANALYSIS_PROMPT.format(
+                ticker=ticker,
+                as_of=as_of,
+                company_json=json.dumps(polygon_data.company, ensure_ascii=True),
+                price_summary=price_summary,
+                metrics_json=json.dumps(metrics, ensure_ascii=True),
+            )
+        return await _run_agent(prompt, "analysis_agent")
 
-    technical_result = await analyze_technical(
-        ticker=ticker,
-        as_of=as_of,
-        price_data=polygon_data.aggregates,
-        indicators={},
-    )
-    fundamental_result = await analyze_fundamental(
-        ticker=ticker,
-        as_of=as_of,
-        company_json=polygon_data.company,
-        financials=polygon_data.financials,
-        metrics=metrics,
-    )
-    compiler_result = await analyze_compiler(
-        ticker=ticker,
-        as_of=as_of,
-        technical_result=technical_result,
-        fundamental_result=fundamental_result,
-    )
+    try:
+        report_markdown = await gated(
+            "analysis_agent", agent_inputs(features, "analysis_agent"), run_analysis
+        )
+        scorecard = await gated(
+            "score_agent",
+            agent_inputs(features, "score_agent"),
+            lambda: analyze_score(
+                ticker=ticker,
+                as_of=as_of,
+                company_json=polygon_data.company,
+                price_summary=price_summary,
+                metrics=metrics,
+            ),
+        )
+        technical_result = await gated(
+            "technical_agent",
+            agent_inputs(features, "technical_agent"),
+            lambda: analyze_technical(
+                ticker=ticker,
+                as_of=as_of,
+                price_data=polygon_data.aggregates,
+                indicators={},
+            ),
+        )
+        fundamental_result = await gated(
+            "fundamental_agent",
+            agent_inputs(features, "fundamental_agent"),
+            lambda: analyze_fundamental(
+                ticker=ticker,
+                as_of=as_of,
+                company_json=polygon_data.company,
+                financials=polygon_data.financials,
+                metrics=metrics,
+            ),
+        )
+        # The compiler only sees the two diagnostics, so it reruns whenever either
+        # of them was regenerated.
+        if technical_result is None or fundamental_result is None:
+            missing.append("compiler_agent")
+            compiler_result = None
+        else:
+            compiler_result = await gated(
+                "compiler_agent",
+                {
+                    name: output_stamp(record, name)
+                    for name in ("technical_agent", "fundamental_agent")
+                },
+                lambda: analyze_compiler(
+                    ticker=ticker,
+                    as_of=as_of,
+                    technical_result=technical_result,
+                    fundamental_result=fundamental_result,
+                ),
+            )
+    finally:
+        save_record(ticker, record)
 
     result = {
         "ticker": ticker,
@@ -350,9 +656,20 @@ async def analyze_stock(ticker: str) -> Dict[str, Any]:
         "metrics": metrics,
         "scorecard": scorecard,
         "compiler_scorecard": compiler_result,
+        "usage": usage,
+        "carried_forward": carried_forward,
+        "partial": bool(missing),
+        "missing": missing,
         "as_of": as_of,
     }
     logger.info(
-        "Analyze done: %s (%.2fs)", ticker, time.perf_counter() - overall_start
+        "Analyze done: %s (%.2fs, %d/5 agents carried, %d missing, "
+        "%d/%d prompt tokens cached)",
+        ticker,
+        time.perf_counter() - overall_start,
+        len(carried_forward),
+        len(missing),
+        sum(agent["cached_tokens"] for agent in usage.values()),
+        sum(agent["prompt_tokens"] for agent in usage.values()),
     )
     return result
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, replace
+import json
+import logging
+import math
+from typing import Any, Deque, Dict, Optional
+
+import numpy as np
+
+from app.core.config import (
+    AGENT_HEDGE_BUDGET,
+    AGENT_HEDGE_MIN_SAMPLES,
+    AGENT_HEDGE_PERCENTILE,
+    AGENT_MAX_OUTPUT_TOKENS,
+    AGENT_MODEL,
+    AGENT_ROUTES,
+    AGENT_TIMEOUT_SECONDS,
+)
+
+AGENT_NAMES = (
+    "analysis_agent",
+    "score_agent",
+    "technical_agent",
+    "fundamental_agent",
+    "compiler_agent",
+)
+LATENCY_WINDOW = 200
+CHARS_PER_TOKEN = 4
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AgentRoute:
+    model: str = AGENT_MODEL
+    timeout: float = AGENT_TIMEOUT_SECONDS
+    fallback_model: Optional[str] = None
+    retry_attempts: int = 5
+    max_output_tokens: int = AGENT_MAX_OUTPUT_TOKENS
+    hedge: bool = True
+
+
+ROUTE_FIELD_TYPES = {
+    "model": str,
+    "timeout": float,
+    "fallback_model": str,
+    "retry_attempts": int,
+    "max_output_tokens": int,
+    "hedge": bool,
+}
+
+
+def _coerce_route_value(key: str, value: Any) -> Any:
+    kind = ROUTE_FIELD_TYPES[key]
+    if value is None and key == "fallback_model":
+        return None
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+        raise ValueError(f"expected a boolean, got {value!r}")
+    if kind is str:
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+        raise ValueError(f"expected a non-empty string, got {value!r}")
+    if isinstance(value, bool):
+        raise ValueError(f"expected a number, got {value!r}")
+    number = float(value)
+    if kind is int:
+        if not number.is_integer():
+            raise ValueError(f"expected an integer, got {value!r}")
+        number = int(number)
+    if not math.isfinite(number) or number <= 0:
+        raise ValueError(f"expected a positive number, got {value!r}")
+    return number
+
+
+def load_routes(raw: str = AGENT_ROUTES) -> Dict[str, AgentRoute]:
+    routes = {name: AgentRoute() for name in AGENT_NAMES}
+    if not raw:
+        return routes
+    try:
+        overrides = json.loads(raw)
+    except json.JSONDecodeError:
+        logger.error("AGENT_ROUTES is not valid JSON; using default routes.")
+        return routes
+    if not isinstance(overrides, dict):
+        logger.error("AGENT_ROUTES must be a JSON object; using default routes.")
+        return routes
+    for name, override in overrides.items():
+        if not isinstance(override, dict):
+            logger.error("Ignoring AGENT_ROUTES entry for %s: expected an object.", name)
+            continue
+        values: Dict[str, Any] = {}
+        for key, value in override.items():
+            if key not in ROUTE_FIELD_TYPES:
+                logger.warning("Ignoring unknown AGENT_ROUTES key %s for %s", key, name)
+                continue
+            try:
+                values[key] = _coerce_route_value(key, value)
+            except (TypeError, ValueError) as exc:
+                logger.error("Ignoring AGENT_ROUTES %s.%s: %s", name, key, exc)
+        routes[name] = replace(routes.get(name, AgentRoute()), **values)
+    return routes
+
+
+class LatencyTracker:
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def percentile(
+        self,
+        name: str,
+        quantile: float = AGENT_HEDGE_PERCENTILE,
+        min_samples: int = AGENT_HEDGE_MIN_SAMPLES,
+    ) -> Optional[float]:
+        samples = self._samples.get(name)
+        if not samples or len(samples) < min_samples:
+            return None
+        return float(np.quantile(np.fromiter(samples, dtype=np.float64), quantile))
+
+
+class HedgeBudget:
+    def __init__(self, ratio: float = AGENT_HEDGE_BUDGET, burst: float = 5.0) -> None:
+        self.ratio = max(0.0, ratio)
+        self.burst = burst
+        self.tokens = 0.0
+
+    def record_call(self) -> None:
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+AGENT_ROUTE_TABLE = load_routes()
+agent_latency = LatencyTracker()
+hedge_budget = HedgeBudget()
+
+
+def get_route(name: str) -> AgentRoute:
+    return AGENT_ROUTE_TABLE.get(name) or AgentRoute()
@@ -1,26 +1,382 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from datetime import date, timedelta
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Literal, Optional
+
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import FileResponse, StreamingResponse
 
 from app.agents.orchestrator import GeminiError, analyze_stock
-from app.models.schemas import AnalyzeRequest, AnalyzeResponse
-from app.services.polygon import PolygonError, TickerNotFoundError
+from app.core.admission import AdmissionController, ServiceSaturatedError
+from app.core.config import (
+    ANALYZE_MAX_IN_FLIGHT,
+    ANALYZE_MAX_QUEUE,
+    ANALYZE_RETRY_AFTER_SECONDS,
+)
+from app.core.deadline import DeadlineExceededError, requested_deadline
+from app.core.profiling import ProfilerBusyError, is_admin, profiler
+from app.models.schemas import (
+    AnalyzeRequest,
+    AnalyzeResponse,
+    BarMetricsResponse,
+    PortfolioRequest,
+    PortfolioResponse,
+    ProfilingArmRequest,
+    ProfilingStatus,
+    ScreenRefreshRequest,
+    ScreenRefreshResponse,
+    ScreenRequest,
+    ScreenResponse,
+    ScreenResult,
+    TickerSearchResponse,
+)
+from app.services.live import Subscriber, get_live_hub
+from app.services.metrics import compute_streaming_metrics
+from app.services.polygon import (
+    PolygonError,
+    TickerNotFoundError,
+    iter_aggregate_pages,
+)
+from app.services.portfolio import PortfolioError, analyze_portfolio
+from app.services.screener import (
+    ScreenerError,
+    get_metrics_table,
+    refresh_metrics_table,
+)
+from app.services.ticker_index import get_ticker_index
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+analyze_admission = AdmissionController(
+    max_in_flight=ANALYZE_MAX_IN_FLIGHT,
+    max_queue=ANALYZE_MAX_QUEUE,
+    min_retry_after=ANALYZE_RETRY_AFTER_SECONDS,
+)
+
+
+def _saturated_error(exc: ServiceSaturatedError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(exc),
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def _analysis_error(ticker: str, exc: Exception) -> Optional[HTTPException]:
+    if isinstance(exc, ServiceSaturatedError):
+        return _saturated_error(exc)
+    if isinstance(exc, DeadlineExceededError):
+        return HTTPException(
+            status_code=504,
+            detail=f"Deadline reached before any analysis of {ticker}: {exc}",
+        )
+    if isinstance(exc, TickerNotFoundError):
+        return HTTPException(status_code=400, detail=str(exc))
+    if isinstance(exc, PolygonError):
+        return HTTPException(
+            status_code=400,
+            detail=f"Polygon error while analyzing {ticker}: {exc}",
+        )
+    if isinstance(exc, GeminiError):
+        return HTTPException(
+            status_code=502,
+            detail=f"Gemini error while generating report: {exc}",
+        )
+    return None
+
+
+def _ensure_known_ticker(ticker: str) -> None:
+    index = get_ticker_index()
+    if len(index) and ticker not in index:
+        raise HTTPException(status_code=400, detail=f"Ticker '{ticker}' not found.")
+
+
+async def _analyze(
+    ticker: str, deadline: Optional[float], key: Optional[str] = None
+) -> AnalyzeResponse:
+    _ensure_known_ticker(ticker)
+    try:
+        result = await analyze_admission.run(
+            key or ticker, lambda: analyze_stock(ticker, deadline=deadline)
+        )
+    except (
+        ServiceSaturatedError,
+        PolygonError,
+        GeminiError,
+        DeadlineExceededError,
+    ) as exc:
+        raise _analysis_error(ticker, exc) from exc
+    return AnalyzeResponse(**result)
+
 
 @router.post("/analyze", response_model=AnalyzeResponse)
-async def analyze(request: AnalyzeRequest) -> AnalyzeResponse:
+async def analyze(
+    request: AnalyzeRequest, http_request: Request, response: Response
+) -> AnalyzeResponse:
+    deadline = requested_deadline(http_request.headers)
     try:
-        result = await analyze_stock(request.ticker)
-    except TickerNotFoundError as exc:
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
+        mode = profiler.requested_mode(http_request.headers)
+    except ProfilerBusyError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    if mode is None:
+        return await _analyze(request.ticker, deadline)
+    with profiler.profile(f"analyze-{request.ticker}", mode) as session:
+        response.headers["X-Profile-Id"] = session.id
+        return await _analyze(
+            request.ticker, deadline, key=f"{request.ticker}#{session.id}"
+        )
+
+
+def _require_admin(request: Request) -> None:
+    if not is_admin(request.headers):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
+
+def _profiling_status() -> ProfilingStatus:
+    return ProfilingStatus(
+        armed=profiler.armed,
+        mode=profiler.armed_mode,
+        active=profiler.active.id if profiler.active else None,
+        profiles=profiler.list_profiles(),
+    )
+
+
+@router.get("/admin/profiling", response_model=ProfilingStatus)
+async def profiling_status(request: Request) -> ProfilingStatus:
+    _require_admin(request)
+    return _profiling_status()
+
+
+@router.post("/admin/profiling", response_model=ProfilingStatus)
+async def arm_profiling(body: ProfilingArmRequest, request: Request) -> ProfilingStatus:
+    _require_admin(request)
+    profiler.arm(body.count, body.mode)
+    return _profiling_status()
+
+
+@router.get("/admin/profiles/{name}")
+async def download_profile(name: str, request: Request) -> FileResponse:
+    _require_admin(request)
+    if name not in profiler.list_profiles():
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return FileResponse(profiler.directory / name)
+
+
+@router.post("/analyze/stream")
+async def analyze_stream(
+    request: AnalyzeRequest, http_request: Request
+) -> StreamingResponse:
+    ticker = request.ticker
+    deadline = requested_deadline(http_request.headers)
+    _ensure_known_ticker(ticker)
+    if analyze_admission.saturated:
+        raise _saturated_error(ServiceSaturatedError(analyze_admission.retry_after()))
+
+    queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+
+    def on_partial(agent: str, text: str) -> None:
+        queue.put_nowait({"type": "partial", "agent": agent, "text": text})
+
+    async def run() -> None:
+        try:
+            result = await analyze_admission.run(
+                f"{ticker}#stream-{id(queue)}",
+                lambda: analyze_stock(ticker, on_partial=on_partial, deadline=deadline),
+            )
+            response = AnalyzeResponse(**result)
+            queue.put_nowait({"type": "result", "data": response.model_dump()})
+        except (
+            ServiceSaturatedError,
+            PolygonError,
+            GeminiError,
+            DeadlineExceededError,
+        ) as exc:
+            error = _analysis_error(ticker, exc)
+            queue.put_nowait(
+                {"type": "error", "status": error.status_code, "detail": error.detail}
+            )
+        except Exception:
+            logger.exception("Streamed analysis failed: %s", ticker)
+            queue.put_nowait(
+                {
+                    "type": "error",
+                    "status": 500,
+                    "detail": f"Unexpected error while analyzing {ticker}.",
+                }
+            )
+        finally:
+            queue.put_nowait(None)
+
+    task = asyncio.create_task(run())
+
+    async def body() -> AsyncIterator[str]:
+        try:
+            while (item := await queue.get()) is not None:
+                yield json.dumps(item, ensure_ascii=True) + "\n"
+        finally:
+            task.cancel()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@router.get("/tickers/search", response_model=TickerSearchResponse)
+async def ticker_search(
+    q: str = Query(..., min_length=1, max_length=64),
+    limit: int = Query(10, ge=1, le=50),
+) -> TickerSearchResponse:
+    index = get_ticker_index()
+    return TickerSearchResponse(
+        query=q, as_of=index.built_at, results=index.search(q, limit=limit)
+    )
+
+
+@router.get("/bars/{ticker}/metrics", response_model=BarMetricsResponse)
+async def bar_metrics(
+    ticker: str,
+    timespan: Literal["minute", "hour", "day"] = "day",
+    multiplier: int = Query(1, ge=1, le=60),
+    days: int = Query(30, ge=1, le=3650),
+) -> BarMetricsResponse:
+    try:
+        ticker = AnalyzeRequest(ticker=ticker).ticker
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    end_date = date.today()
+    start_date = end_date - timedelta(days=days)
+    pages = iter_aggregate_pages(ticker, start_date, end_date, timespan, multiplier)
+    try:
+        metrics = await asyncio.to_thread(compute_streaming_metrics, pages)
     except PolygonError as exc:
         raise HTTPException(
             status_code=400,
-            detail=f"Polygon error while analyzing {request.ticker}: {exc}",
+            detail=f"Polygon error while fetching bars for {ticker}: {exc}",
         ) from exc
-    except GeminiError as exc:
+    if not metrics:
         raise HTTPException(
-            status_code=502,
-            detail=f"Gemini error while generating report: {exc}",
-        ) from exc
-    return AnalyzeResponse(**result)
+            status_code=404, detail=f"No aggregate data found for ticker '{ticker}'."
+        )
+    return BarMetricsResponse(
+        ticker=ticker,
+        timespan=timespan,
+        multiplier=multiplier,
+        start_date=start_date.isoformat(),
+        end_date=end_date.isoformat(),
+        metrics=metrics,
+    )
+
+
+@router.post("/portfolio", response_model=PortfolioResponse)
+async def portfolio(request: PortfolioRequest) -> PortfolioResponse:
+    positions: Dict[str, float] = {}
+    for position in request.positions:
+        positions[position.ticker] = positions.get(position.ticker, 0.0) + position.weight
+    try:
+        result = await asyncio.to_thread(
+            analyze_portfolio,
+            positions,
+            lookback_days=request.lookback_days,
+            confidence=request.confidence,
+        )
+    except PortfolioError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if not request.include_matrices:
+        result.update(covariance=None, correlation=None)
+    return PortfolioResponse(**result)
+
+
+@router.post("/screen", response_model=ScreenResponse)
+async def screen(request: ScreenRequest, http_request: Request) -> ScreenResponse:
+    table = get_metrics_table()
+    try:
+        page = table.query(
+            predicates=[
+                (p.field, p.op, p.value, p.value_to) for p in request.predicates
+            ],
+            sort_by=request.sort_by,
+            descending=request.descending,
+            offset=request.offset,
+            limit=request.limit,
+        )
+    except ScreenerError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    analyses = []
+    deadline = requested_deadline(http_request.headers)
+    for ticker, _ in page.rows[: request.analyze_top]:
+        try:
+            analyses.append(await _analyze(ticker, deadline))
+        except HTTPException as exc:
+            logger.warning("Screen analysis skipped %s: %s", ticker, exc.detail)
+
+    return ScreenResponse(
+        total=page.total,
+        offset=request.offset,
+        limit=request.limit,
+        as_of=table.as_of,
+        results=[ScreenResult(ticker=t, metrics=m) for t, m in page.rows],
+        analyses=analyses,
+    )
+
+
+@router.post("/screen/refresh", response_model=ScreenRefreshResponse)
+async def screen_refresh(request: ScreenRefreshRequest) -> ScreenRefreshResponse:
+    try:
+        table = await asyncio.to_thread(refresh_metrics_table, request.tickers)
+    except ScreenerError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return ScreenRefreshResponse(tickers=len(table), as_of=table.as_of)
+
+
+@router.websocket("/live")
+async def live(websocket: WebSocket) -> None:
+    hub = get_live_hub()
+    await websocket.accept()
+    if hub is None:
+        await websocket.close(code=1013, reason="Live feed is not enabled.")
+        return
+
+    subscriber = Subscriber()
+
+    async def forward() -> None:
+        while True:
+            await websocket.send_json(await subscriber.queue.get())
+
+    sender = asyncio.create_task(forward())
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                message = {}
+            action = message.get("action")
+            tickers = message.get("tickers") or []
+            if not isinstance(tickers, list) or not all(
+                isinstance(ticker, str) for ticker in tickers
+            ):
+                action = None
+            if action == "subscribe":
+                await hub.subscribe(subscriber, tickers)
+            elif action == "unsubscribe":
+                await hub.unsubscribe(subscriber, tickers)
+            else:
+                await websocket.send_json(
+                    {"error": "Expected action 'subscribe' or 'unsubscribe'."}
+                )
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        await hub.remove(subscriber)
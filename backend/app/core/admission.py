@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class ServiceSaturatedError(Exception):
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("Service is saturated; retry later.")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queue: int,
+        min_retry_after: int = 1,
+    ) -> None:
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.min_retry_after = max(1, min_retry_after)
+        self.active = 0
+        self.queued = 0
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._tasks: Dict[str, asyncio.Task[Any]] = {}
+        self._avg_seconds: float | None = None
+
+    def retry_after(self) -> int:
+        if self._avg_seconds is None:
+            return self.min_retry_after
+        backlog = (self.queued + 1) / self.max_in_flight
+        return max(self.min_retry_after, math.ceil(self._avg_seconds * backlog))
+
+    @property
+    def saturated(self) -> bool:
+        return self.active + self.queued >= self.max_in_flight + self.max_queue
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        task = self._tasks.get(key)
+        if task is None:
+            if self.saturated:
+                raise ServiceSaturatedError(self.retry_after())
+            self.queued += 1
+            task = asyncio.create_task(self._admit(factory))
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task[Any]) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()
+
+    async def _admit(self, factory: Callable[[], Awaitable[T]]) -> T:
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.active += 1
+        start = time.perf_counter()
+        try:
+            return await factory()
+        finally:
+            self.active -= 1
+            self._slots.release()
+            elapsed = time.perf_counter() - start
+            if self._avg_seconds is None:
+                self._avg_seconds = elapsed
+            else:
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
@@ -11,3 +11,52 @@ POLYGON_API_KEY = os.getenv("POLYGON_API_KEY")
 
 if GEMINI_API_KEY and not os.getenv("GOOGLE_API_KEY"):
     os.environ["GOOGLE_API_KEY"] = GEMINI_API_KEY
+
+SCREENER_UNIVERSE = [
+    ticker.strip().upper()
+    for ticker in os.getenv("SCREENER_UNIVERSE", "").split(",")
+    if ticker.strip()
+]
+SCREENER_REFRESH_UTC = os.getenv("SCREENER_REFRESH_UTC", "21:30")
+SCREENER_WORKERS = int(os.getenv("SCREENER_WORKERS", "8"))
+
+LIVE_FEED = os.getenv("LIVE_FEED", "").lower()
+LIVE_REPLAY_PATH = os.getenv("LIVE_REPLAY_PATH")
+LIVE_REPLAY_SPEED = float(os.getenv("LIVE_REPLAY_SPEED", "0"))
+LIVE_POLYGON_WS_URL = os.getenv("LIVE_POLYGON_WS_URL", "wss://socket.polygon.io/stocks")
+LIVE_POLYGON_CHANNEL = os.getenv("LIVE_POLYGON_CHANNEL", "T")
+
+ANALYZE_MAX_IN_FLIGHT = int(os.getenv("ANALYZE_MAX_IN_FLIGHT", "4"))
+ANALYZE_MAX_QUEUE = int(os.getenv("ANALYZE_MAX_QUEUE", "16"))
+ANALYZE_RETRY_AFTER_SECONDS = int(os.getenv("ANALYZE_RETRY_AFTER_SECONDS", "5"))
+
+AGENT_MODEL = os.getenv("AGENT_MODEL", "gemini-2.5-flash-lite")
+AGENT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", "120"))
+AGENT_ROUTES = os.getenv("AGENT_ROUTES", "")
+AGENT_HEDGE_PERCENTILE = float(os.getenv("AGENT_HEDGE_PERCENTILE", "0.9"))
+AGENT_HEDGE_MIN_SAMPLES = int(os.getenv("AGENT_HEDGE_MIN_SAMPLES", "20"))
+AGENT_HEDGE_BUDGET = float(os.getenv("AGENT_HEDGE_BUDGET", "0.1"))
+
+AGENT_BACKEND = os.getenv("AGENT_BACKEND", "gemini").lower()
+
+DATA_DIR = Path(os.getenv("DATA_DIR", Path(__file__).resolve().parents[2] / "data"))
+FINANCIALS_REFRESH_HOURS = float(os.getenv("FINANCIALS_REFRESH_HOURS", "24"))
+AGENT_MAX_OUTPUT_TOKENS = int(os.getenv("AGENT_MAX_OUTPUT_TOKENS", "4096"))
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", DATA_DIR / "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+
+BAR_CACHE_TTL_SECONDS = float(os.getenv("BAR_CACHE_TTL_SECONDS", "900"))
+BAR_CACHE_MAX_TICKERS = int(os.getenv("BAR_CACHE_MAX_TICKERS", "5000"))
+PORTFOLIO_WORKERS = int(os.getenv("PORTFOLIO_WORKERS", "16"))
+
+TICKER_INDEX_REFRESH_HOURS = float(os.getenv("TICKER_INDEX_REFRESH_HOURS", "24"))
+
+MATERIALITY_ENABLED = os.getenv("MATERIALITY_ENABLED", "true").lower() == "true"
+MATERIALITY_THRESHOLDS = os.getenv("MATERIALITY_THRESHOLDS", "")
+MATERIALITY_MAX_AGE_HOURS = float(os.getenv("MATERIALITY_MAX_AGE_HOURS", "168"))
+
+ANALYZE_DEADLINE_SECONDS = float(os.getenv("ANALYZE_DEADLINE_SECONDS", "180"))
+POLYGON_TIMEOUT_SECONDS = float(os.getenv("POLYGON_TIMEOUT_SECONDS", "20"))
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+from typing import Iterator, Mapping, Optional
+
+from app.core.config import ANALYZE_DEADLINE_SECONDS
+
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+
+class DeadlineExceededError(Exception):
+    pass
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+def requested_deadline(headers: Mapping[str, str]) -> Optional[float]:
+    raw = headers.get(DEADLINE_HEADER)
+    seconds = ANALYZE_DEADLINE_SECONDS
+    if raw:
+        try:
+            seconds = float(raw) / 1000
+        except ValueError:
+            pass
+    if seconds <= 0:
+        return None
+    return time.monotonic() + seconds
+
+
+@contextmanager
+def deadline_scope(expires_at: Optional[float]) -> Iterator[None]:
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def stage_timeout(limit: float, stage: str = "request") -> float:
+    left = remaining()
+    if left is None:
+        return limit
+    if left <= 0:
+        raise DeadlineExceededError(f"Deadline reached before {stage}.")
+    return min(limit, left)
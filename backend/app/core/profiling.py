@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+import cProfile
+from datetime import datetime, timezone
+import json
+import logging
+import os
+from pathlib import Path
+import pstats
+import re
+import sys
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    TypeVar,
+)
+
+from app.core.config import (
+    ADMIN_TOKEN,
+    PROFILE_DIR,
+    PROFILE_MAX_FILES,
+    PROFILE_SAMPLE_INTERVAL_MS,
+)
+
+PROFILE_MODES = ("sampling", "deterministic")
+AWAIT_FRAME = "[await]"
+WORKER_FRAME = "[worker]"
+
+T = TypeVar("T")
+
+
+class ProfilerBusyError(Exception):
+    pass
+
+
+logger = logging.getLogger(__name__)
+
+_active_profile: ContextVar[Optional["RequestProfile"]] = ContextVar(
+    "active_profile", default=None
+)
+_NO_STAGE = nullcontext()
+
+
+class RequestProfile:
+    def __init__(self, label: str, mode: str) -> None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        self.id = f"{stamp}-{re.sub(r'[^A-Za-z0-9.-]', '_', label)}-{mode}"
+        self.label = label
+        self.mode = mode
+        self.stages: List[Dict[str, Any]] = []
+        self.stage_stack: List[str] = []
+        self.samples: Counter[str] = Counter()
+        self.thread_id = threading.get_ident()
+        self.workers: Dict[int, str] = {}
+        self._worker_cpu: Counter[str] = Counter()
+        self._worker_profilers: List[cProfile.Profile] = []
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._profiler: Optional[cProfile.Profile] = None
+        self._started = 0.0
+
+    @property
+    def current_stage(self) -> str:
+        return self.stage_stack[-1] if self.stage_stack else "request"
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        if self.mode == "deterministic":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = threading.Thread(
+                target=self._sample, name=f"profiler-{self.id}", daemon=True
+            )
+            self._sampler.start()
+
+    def stop(self) -> None:
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+
+    def _sample(self) -> None:
+        interval = PROFILE_SAMPLE_INTERVAL_MS / 1000
+        while not self._stop.wait(interval):
+            frames = sys._current_frames()
+            frame = frames.get(self.thread_id)
+            if frame is not None:
+                stage = f"stage:{self.current_stage}"
+                if _is_idle(frame):
+                    self.samples[f"{stage};{AWAIT_FRAME}"] += 1
+                else:
+                    self.samples[";".join([stage, *_stack(frame)])] += 1
+            for ident, stage_name in dict(self.workers).items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    prefix = [f"stage:{stage_name}", WORKER_FRAME]
+                    self.samples[";".join([*prefix, *_stack(frame)])] += 1
+
+    def run_worker(self, stage: str, func: Callable[..., T], *args: Any) -> T:
+        ident = threading.get_ident()
+        profiler: Optional[cProfile.Profile] = None
+        if self.mode == "deterministic":
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler per process; it
+                # already observes every thread.
+                profiler = None
+        self.workers[ident] = stage
+        cpu_start = time.thread_time()
+        try:
+            return func(*args)
+        finally:
+            self._worker_cpu[stage] += time.thread_time() - cpu_start
+            self.workers.pop(ident, None)
+            if profiler is not None:
+                profiler.disable()
+                self._worker_profilers.append(profiler)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self.stage_stack.append(name)
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            worker_cpu = self._worker_cpu.pop(name, 0.0)
+            self.stage_stack.pop()
+            self.stages.append(
+                {
+                    "stage": name,
+                    "wall_seconds": round(wall, 6),
+                    "cpu_seconds": round(cpu, 6),
+                    "worker_cpu_seconds": round(worker_cpu, 6),
+                    "await_seconds": round(max(0.0, wall - cpu - worker_cpu), 6),
+                }
+            )
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "label": self.label,
+            "mode": self.mode,
+            "wall_seconds": round(time.perf_counter() - self._started, 6),
+            "stages": self.stages,
+        }
+
+
+def _stack(frame: Any) -> List[str]:
+    stack: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:"
+            f"{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    return stack[::-1]
+
+
+def _is_idle(frame: Any) -> bool:
+    code = frame.f_code
+    return code.co_name == "select" and code.co_filename.endswith("selectors.py")
+
+
+class Profiler:
+    def __init__(self, directory: Path = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        self.armed = 0
+        self.armed_mode = "sampling"
+        self.active: Optional[RequestProfile] = None
+
+    def arm(self, count: int, mode: str) -> None:
+        self.armed = max(0, count)
+        self.armed_mode = mode
+
+    def requested_mode(self, headers: Mapping[str, str]) -> Optional[str]:
+        # Both modes observe the whole event-loop thread, so concurrent sessions
+        # would mix requests; armed profiles wait for the active one to finish.
+        if self.armed > 0 and self.active is None:
+            self.armed -= 1
+            return self.armed_mode
+        mode = headers.get("x-profile")
+        if mode is None:
+            return None
+        if not is_admin(headers):
+            logger.warning("Ignoring X-Profile header without a valid admin token.")
+            return None
+        if self.active is not None:
+            raise ProfilerBusyError("Another request is being profiled; retry later.")
+        mode = mode.lower()
+        return mode if mode in PROFILE_MODES else "sampling"
+
+    @contextmanager
+    def profile(self, label: str, mode: str) -> Iterator[RequestProfile]:
+        if self.active is not None:
+            raise ProfilerBusyError("Another request is being profiled; retry later.")
+        session = RequestProfile(label, mode)
+        self.active = session
+        token = _active_profile.set(session)
+        session.start()
+        try:
+            yield session
+        finally:
+            session.stop()
+            _active_profile.reset(token)
+            self.active = None
+            try:
+                self._write(session)
+            except OSError:
+                logger.exception("Failed to write profile %s", session.id)
+
+    def _write(self, session: RequestProfile) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        base = self.directory / session.id
+        if session._profiler is not None:
+            stats = pstats.Stats(session._profiler)
+            for worker in session._worker_profilers:
+                stats.add(worker)
+            stats.dump_stats(f"{base}.prof")
+        else:
+            lines = [f"{stack} {count}" for stack, count in session.samples.items()]
+            Path(f"{base}.folded").write_text("\n".join(lines) + "\n")
+        Path(f"{base}.json").write_text(json.dumps(session.summary(), indent=2))
+        logger.info("Profile written: %s", base)
+        self._prune()
+
+    def _prune(self) -> None:
+        files = sorted(self.directory.glob("*.json"), key=lambda path: path.stat().st_mtime)
+        for summary in files[: max(0, len(files) - self.max_files)]:
+            for path in self.directory.glob(f"{summary.stem}.*"):
+                path.unlink(missing_ok=True)
+
+    def list_profiles(self) -> List[str]:
+        if not self.directory.exists():
+            return []
+        return sorted(
+            (path.name for path in self.directory.iterdir() if path.is_file()),
+            reverse=True,
+        )
+
+
+def is_admin(headers: Mapping[str, str]) -> bool:
+    return bool(ADMIN_TOKEN) and headers.get("x-admin-token") == ADMIN_TOKEN
+
+
+async def profiled_to_thread(func: Callable[..., T], *args: Any) -> T:
+    session = _active_profile.get()
+    if session is None:
+        return await asyncio.to_thread(func, *args)
+    return await asyncio.to_thread(
+        session.run_worker, session.current_stage, func, *args
+    )
+
+
+def profile_stage(name: str) -> ContextManager[None]:
+    session = _active_profile.get()
+    if session is None:
+        return _NO_STAGE
+    return session.stage(name)
+
+
+profiler = Profiler()
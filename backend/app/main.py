@@ -1,12 +1,18 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 import logging
 import os
 from pathlib import Path
+from typing import AsyncIterator
 
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.api import router as api_router
+from app.core.config import POLYGON_API_KEY, SCREENER_UNIVERSE
+from app.services import screener, ticker_index
+from app.services.live import create_live_hub
 
 
 def _configure_logging() -> None:
@@ -20,7 +26,28 @@ def _configure_logging() -> None:
 
 _configure_logging()
 
-app = FastAPI(title="StockIQ")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    tasks = []
+    ticker_index.load_ticker_index()
+    if POLYGON_API_KEY:
+        tasks.append(asyncio.create_task(ticker_index.run_refresh_schedule()))
+    if SCREENER_UNIVERSE:
+        tasks.append(asyncio.create_task(screener.run_refresh_schedule()))
+    hub = create_live_hub()
+    if hub is not None:
+        tasks.append(asyncio.create_task(hub.run()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+
+app = FastAPI(title="StockIQ", lifespan=lifespan)
 app.include_router(api_router, prefix="/api")
 
 BASE_DIR = Path(__file__).resolve().parent
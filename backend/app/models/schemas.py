@@ -20,13 +20,134 @@ class AnalyzeRequest(BaseModel):
 
 class AnalyzeResponse(BaseModel):
     ticker: str
-    report_markdown: str
+    report_markdown: Optional[str] = None
     metrics: Dict[str, Any]
-    scorecard: Dict[str, Any]
+    scorecard: Optional[Dict[str, Any]] = None
     compiler_scorecard: Optional[Dict[str, Any]] = None
+    usage: Optional[Dict[str, Dict[str, int]]] = None
+    carried_forward: List[str] = Field(default_factory=list)
+    partial: bool = False
+    missing: List[str] = Field(default_factory=list)
     as_of: str
 
 
+class PortfolioPosition(BaseModel):
+    ticker: str
+    weight: float
+
+    @field_validator("ticker")
+    @classmethod
+    def normalize_ticker(cls, value: str) -> str:
+        return AnalyzeRequest.normalize_ticker(value)
+
+
+class PortfolioRequest(BaseModel):
+    positions: List[PortfolioPosition] = Field(..., min_length=1, max_length=500)
+    lookback_days: int = Field(252, ge=30, le=1260)
+    confidence: float = Field(0.95, gt=0.5, lt=1)
+    include_matrices: bool = True
+
+
+class RiskContribution(BaseModel):
+    ticker: str
+    weight: float
+    volatility_annualized: float
+    marginal_risk: float
+    risk_contribution: float
+    pct_contribution: float
+
+
+class PortfolioResponse(BaseModel):
+    tickers: List[str]
+    missing: List[str]
+    start_date: str
+    end_date: str
+    observations: int
+    confidence: float
+    volatility_annualized: float
+    var: float
+    cvar: float
+    max_drawdown: float
+    contributions: List[RiskContribution]
+    covariance: Optional[List[List[float]]] = None
+    correlation: Optional[List[List[float]]] = None
+    as_of: str
+
+
+class ProfilingArmRequest(BaseModel):
+    count: int = Field(1, ge=0, le=100)
+    mode: Literal["sampling", "deterministic"] = "sampling"
+
+
+class ProfilingStatus(BaseModel):
+    armed: int
+    mode: Literal["sampling", "deterministic"]
+    active: Optional[str] = None
+    profiles: List[str]
+
+
+class BarMetricsResponse(BaseModel):
+    ticker: str
+    timespan: Literal["minute", "hour", "day"]
+    multiplier: int
+    start_date: str
+    end_date: str
+    metrics: Dict[str, Any]
+
+
+class ScreenPredicate(BaseModel):
+    field: str
+    op: Literal["lt", "lte", "gt", "gte", "eq", "between"]
+    value: float
+    value_to: Optional[float] = None
+
+
+class ScreenRequest(BaseModel):
+    predicates: List[ScreenPredicate] = Field(default_factory=list)
+    sort_by: Optional[str] = None
+    descending: bool = True
+    offset: int = Field(0, ge=0)
+    limit: int = Field(50, ge=1, le=500)
+    analyze_top: int = Field(
+        0, ge=0, le=5, description="Run the analysis pipeline on the first N results"
+    )
+
+
+class ScreenResult(BaseModel):
+    ticker: str
+    metrics: Dict[str, float]
+
+
+class ScreenResponse(BaseModel):
+    total: int
+    offset: int
+    limit: int
+    as_of: Optional[str] = None
+    results: List[ScreenResult]
+    analyses: List[AnalyzeResponse] = Field(default_factory=list)
+
+
+class ScreenRefreshRequest(BaseModel):
+    tickers: Optional[List[str]] = None
+
+
+class ScreenRefreshResponse(BaseModel):
+    tickers: int
+    as_of: Optional[str] = None
+
+
+class TickerSuggestion(BaseModel):
+    ticker: str
+    name: str
+    exchange: str
+
+
+class TickerSearchResponse(BaseModel):
+    query: str
+    as_of: Optional[str] = None
+    results: List[TickerSuggestion]
+
+
 class Scorecard(BaseModel):
     score: int = Field(..., ge=0, le=100)
     short_term: Literal["Buy", "Not Buy"]
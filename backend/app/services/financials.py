@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+import json
+import logging
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import DATA_DIR, FINANCIALS_REFRESH_HOURS
+from app.core.deadline import DeadlineExceededError
+from app.services.polygon import PolygonError, iter_result_pages
+
+STORE_DIR = DATA_DIR / "financials"
+FINANCIALS_PAGE_LIMIT = 100
+QUARTERS_PER_YEAR = 4
+
+STATEMENT_FIELDS = {
+    "revenue": ("income_statement", "revenues"),
+    "gross_profit": ("income_statement", "gross_profit"),
+    "operating_income": ("income_statement", "operating_income_loss"),
+    "net_income": ("income_statement", "net_income_loss"),
+    "eps_diluted": ("income_statement", "diluted_earnings_per_share"),
+    "assets": ("balance_sheet", "assets"),
+    "liabilities": ("balance_sheet", "liabilities"),
+    "equity": ("balance_sheet", "equity"),
+    "current_assets": ("balance_sheet", "current_assets"),
+    "current_liabilities": ("balance_sheet", "current_liabilities"),
+    "long_term_debt": ("balance_sheet", "long_term_debt"),
+    "operating_cash_flow": (
+        "cash_flow_statement",
+        "net_cash_flow_from_operating_activities",
+    ),
+}
+
+MARKET_FIELDS = ("market_cap", "dividend_yield")
+
+RATIO_FIELDS = (
+    "revenue_ttm",
+    "net_income_ttm",
+    "eps_ttm",
+    "gross_margin",
+    "operating_margin",
+    "net_margin",
+    "revenue_growth_yoy",
+    "earnings_growth_yoy",
+    "eps_growth_yoy",
+    "debt_to_equity",
+    "liabilities_to_assets",
+    "current_ratio",
+    "return_on_equity",
+    "operating_cash_flow_margin",
+    "cash_conversion",
+)
+
+logger = logging.getLogger(__name__)
+
+_records: Dict[str, Dict[str, Any]] = {}
+_lock = Lock()
+_refresh_locks: Dict[str, Lock] = {}
+
+
+def _store_path(ticker: str) -> Path:
+    return STORE_DIR / f"{ticker.upper()}.json"
+
+
+def _load_store(ticker: str) -> Dict[str, Any]:
+    path = _store_path(ticker)
+    if not path.exists():
+        return {"filings": [], "refreshed_at": None}
+    try:
+        return json.loads(path.read_text())
+    except (OSError, json.JSONDecodeError):
+        logger.warning("Financials store for %s is unreadable; rebuilding.", ticker)
+        return {"filings": [], "refreshed_at": None}
+
+
+def _save_store(ticker: str, store: Dict[str, Any]) -> None:
+    path = _store_path(ticker)
+    tmp_path = path.with_name(f"{path.stem}.{uuid.uuid4().hex}.tmp")
+    try:
+        STORE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(json.dumps(store, separators=(",", ":")))
+        tmp_path.replace(path)
+    except OSError as exc:
+        logger.warning("Could not store financials for %s: %s", ticker, exc)
+        tmp_path.unlink(missing_ok=True)
+
+
+def _refresh_lock(ticker: str) -> Lock:
+    with _lock:
+        return _refresh_locks.setdefault(ticker, Lock())
+
+
+def _compact_filing(result: Dict[str, Any]) -> Dict[str, Any]:
+    statements = result.get("financials") or {}
+    metrics = result.get("metrics") or {}
+    filing: Dict[str, Any] = {
+        "filing_date": result.get("filing_date"),
+        "end_date": result.get("end_date"),
+        "fiscal_period": result.get("fiscal_period"),
+        "fiscal_year": result.get("fiscal_year"),
+        "market_cap": result.get("market_cap") or metrics.get("market_cap"),
+        "dividend_yield": metrics.get("dividend_yield"),
+    }
+    for name, (statement, key) in STATEMENT_FIELDS.items():
+        value = (statements.get(statement) or {}).get(key) or {}
+        filing[name] = value.get("value")
+    return filing
+
+
+def _download_filings(ticker: str, after: Optional[str]) -> List[Dict[str, Any]]:
+    params: Dict[str, Any] = {
+        "ticker": ticker,
+        "timeframe": "quarterly",
+        "sort": "filing_date",
+        "order": "asc",
+        "limit": FINANCIALS_PAGE_LIMIT,
+    }
+    if after:
+        params["filing_date.gt"] = after
+    filings: List[Dict[str, Any]] = []
+    for page in iter_result_pages("/vX/reference/financials", params=params):
+        filings.extend(_compact_filing(result) for result in page)
+    return filings
+
+
+def _is_stale(store: Dict[str, Any]) -> bool:
+    refreshed_at = store.get("refreshed_at")
+    if not refreshed_at:
+        return True
+    age = datetime.now(timezone.utc) - datetime.fromisoformat(refreshed_at)
+    return age.total_seconds() > FINANCIALS_REFRESH_HOURS * 3600
+
+
+def refresh_financials(ticker: str, force: bool = False) -> Dict[str, Any]:
+    # One refresh per ticker at a time; a waiting caller then finds the store fresh.
+    with _refresh_lock(ticker.upper()):
+        return _refresh_financials(ticker, force)
+
+
+def _refresh_financials(ticker: str, force: bool) -> Dict[str, Any]:
+    store = _load_store(ticker)
+    if not force and not _is_stale(store):
+        return store
+    filings: List[Dict[str, Any]] = store.get("filings") or []
+    last_filing = max(
+        (f["filing_date"] for f in filings if f.get("filing_date")), default=None
+    )
+    new_filings = _download_filings(ticker, last_filing)
+    if new_filings:
+        by_period = {(f.get("end_date"), f.get("fiscal_period")): f for f in filings}
+        for filing in new_filings:
+            by_period[(filing.get("end_date"), filing.get("fiscal_period"))] = filing
+        filings = sorted(by_period.values(), key=lambda f: f.get("end_date") or "")
+        logger.info("Financials store %s: %d new filings", ticker, len(new_filings))
+    store = {
+        "filings": filings,
+        "refreshed_at": datetime.now(timezone.utc).isoformat(),
+    }
+    _save_store(ticker, store)
+    return store
+
+
+def _latest_value(df: pd.DataFrame, name: str) -> Optional[float]:
+    if name not in df.columns:
+        return None
+    values = pd.to_numeric(df[name], errors="coerce").dropna()
+    return float(values.iloc[-1]) if not values.empty else None
+
+
+def _fiscal_quarter_index(df: pd.DataFrame) -> pd.Series:
+    quarter = df["fiscal_period"].astype(str).str.extract(r"^Q([1-4])$", expand=False)
+    year = pd.to_numeric(df["fiscal_year"], errors="coerce")
+    return year * QUARTERS_PER_YEAR + pd.to_numeric(quarter, errors="coerce") - 1
+
+
+def compute_financial_ratios(filings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if not filings:
+        return {}
+    df = pd.DataFrame(filings)
+    df = df.sort_values("end_date", kind="stable").reset_index(drop=True)
+    period = _fiscal_quarter_index(df)
+    # Amended filings for the same quarter keep only the latest one.
+    df = df[~(period.notna() & period.duplicated(keep="last"))].reset_index(drop=True)
+    period = _fiscal_quarter_index(df)
+    values = df.reindex(columns=list(STATEMENT_FIELDS)).apply(pd.to_numeric, errors="coerce")
+
+    def ratio(numerator: pd.Series, denominator: pd.Series) -> pd.Series:
+        return numerator / denominator.where(denominator != 0)
+
+    def growth(series: pd.Series) -> pd.Series:
+        by_period = pd.Series(series.to_numpy(), index=period)[period.notna().to_numpy()]
+        previous = pd.Series(
+            by_period.reindex(period - QUARTERS_PER_YEAR).to_numpy(), index=series.index
+        )
+        return ratio(series - previous, previous.abs())
+
+    # TTM sums only cover four consecutive fiscal quarters; a gap yields NaN.
+    span = QUARTERS_PER_YEAR - 1
+    contiguous = (period - period.shift(span)) == span
+    flows = values[["revenue", "net_income", "eps_diluted", "operating_cash_flow"]]
+    ttm = flows.rolling(QUARTERS_PER_YEAR, min_periods=QUARTERS_PER_YEAR).sum()
+    ttm = ttm.where(contiguous, axis=0)
+    derived = pd.DataFrame(
+        {
+            "revenue_ttm": ttm["revenue"],
+            "net_income_ttm": ttm["net_income"],
+            "eps_ttm": ttm["eps_diluted"],
+            "gross_margin": ratio(values["gross_profit"], values["revenue"]),
+            "operating_margin": ratio(values["operating_income"], values["revenue"]),
+            "net_margin": ratio(values["net_income"], values["revenue"]),
+            "revenue_growth_yoy": growth(values["revenue"]),
+            "earnings_growth_yoy": growth(values["net_income"]),
+            "eps_growth_yoy": growth(values["eps_diluted"]),
+            "debt_to_equity": ratio(values["long_term_debt"], values["equity"]),
+            "liabilities_to_assets": ratio(values["liabilities"], values["assets"]),
+            "current_ratio": ratio(
+                values["current_assets"], values["current_liabilities"]
+            ),
+            "return_on_equity": ratio(ttm["net_income"], values["equity"]),
+            "operating_cash_flow_margin": ratio(
+                values["operating_cash_flow"], values["revenue"]
+            ),
+            "cash_conversion": ratio(ttm["operating_cash_flow"], ttm["net_income"]),
+        }
+    ).replace([np.inf, -np.inf], np.nan)
+
+    latest = derived.iloc[-1]
+    record: Dict[str, Any] = {
+        "period_end": df["end_date"].iloc[-1],
+        "filing_date": df["filing_date"].iloc[-1],
+        "periods": len(df),
+    }
+    for name in RATIO_FIELDS:
+        value = latest[name]
+        if pd.notna(value):
+            record[name] = round(float(value), 6)
+    if "eps_ttm" in record:
+        record["eps"] = record["eps_ttm"]
+    for name in MARKET_FIELDS:
+        value = _latest_value(df, name)
+        if value is not None:
+            record[name] = value
+    return {k: v for k, v in record.items() if v is not None}
+
+
+def get_financial_record(ticker: str, force: bool = False) -> Optional[Dict[str, Any]]:
+    ticker = ticker.upper()
+    with _lock:
+        cached = _records.get(ticker)
+    if cached is not None and not force and not _is_stale(cached["store"]):
+        return cached["record"] or None
+    try:
+        store = refresh_financials(ticker, force=force)
+    except (PolygonError, DeadlineExceededError) as exc:
+        logger.warning("Financials refresh failed for %s: %s", ticker, exc)
+        store = _load_store(ticker)
+    record = compute_financial_ratios(store.get("filings") or [])
+    with _lock:
+        _records[ticker] = {
+            "store": {"refreshed_at": store.get("refreshed_at")},
+            "record": record,
+        }
+    return record or None
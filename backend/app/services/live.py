@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import json
+import logging
+from pathlib import Path
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from app.core.config import (
+    LIVE_FEED,
+    LIVE_POLYGON_CHANNEL,
+    LIVE_POLYGON_WS_URL,
+    LIVE_REPLAY_PATH,
+    LIVE_REPLAY_SPEED,
+    POLYGON_API_KEY,
+)
+from app.services.metrics import MS_PER_DAY, TRADING_DAYS_PER_YEAR, RunningMoments
+from app.services.polygon import PolygonError, get_daily_aggregates
+
+PERIOD_DAYS = {"return_1m": 21, "return_3m": 63, "return_6m": 126}
+SUBSCRIBER_QUEUE_SIZE = 256
+FEED_RESTART_SECONDS = 5.0
+
+
+class LiveFeedError(Exception):
+    pass
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Tick:
+    ticker: str
+    price: float
+    timestamp: int
+
+
+class OnlineTickerMetrics:
+    def __init__(self) -> None:
+        self.closes: Deque[float] = deque(maxlen=max(PERIOD_DAYS.values()))
+        self.returns = RunningMoments()
+        self.peak: Optional[float] = None
+        self.max_drawdown = 0.0
+        self.day: Optional[int] = None
+        self.price: Optional[float] = None
+        self.timestamp: Optional[int] = None
+
+    @classmethod
+    def from_aggregates(
+        cls, aggregates: Iterable[Dict[str, Any]]
+    ) -> "OnlineTickerMetrics":
+        metrics = cls()
+        for bar in aggregates:
+            try:
+                metrics.update(float(bar["c"]), int(bar["t"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return metrics
+
+    def _close_day(self, close: float) -> None:
+        if self.closes and self.closes[-1]:
+            self.returns.add(close / self.closes[-1] - 1)
+        self.closes.append(close)
+        self.peak = close if self.peak is None else max(self.peak, close)
+        self.max_drawdown = min(self.max_drawdown, close / self.peak - 1)
+
+    def update(self, price: float, timestamp: int) -> None:
+        day = timestamp // MS_PER_DAY
+        if self.day is not None and day > self.day and self.price is not None:
+            self._close_day(self.price)
+        if self.day is None or day >= self.day:
+            self.day = day
+            self.price = price
+            self.timestamp = timestamp
+
+    def snapshot(self) -> Dict[str, Any]:
+        price = self.price
+        if price is None:
+            return {}
+        metrics: Dict[str, Any] = {"last_close": price, "timestamp": self.timestamp}
+
+        for name, days in PERIOD_DAYS.items():
+            if len(self.closes) >= days and self.closes[-days]:
+                metrics[name] = price / self.closes[-days] - 1
+
+        count, mean, m2 = self.returns.count, self.returns.mean, self.returns.m2
+        if self.closes and self.closes[-1]:
+            value = price / self.closes[-1] - 1
+            count += 1
+            delta = value - mean
+            mean += delta / count
+            m2 += delta * (value - mean)
+        if count >= 2:
+            metrics["volatility_annualized"] = float(
+                np.sqrt(m2 / (count - 1) * TRADING_DAYS_PER_YEAR)
+            )
+
+        peak = price if self.peak is None else max(self.peak, price)
+        metrics["max_drawdown"] = min(self.max_drawdown, price / peak - 1)
+        return metrics
+
+
+class Subscriber:
+    def __init__(self, maxsize: int = SUBSCRIBER_QUEUE_SIZE) -> None:
+        self.tickers: Set[str] = set()
+        self.queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(maxsize=maxsize)
+
+    def push(self, message: Dict[str, Any]) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+
+class ReplayFeed:
+    def __init__(self, path: str, speed: float = 0.0) -> None:
+        self.path = Path(path)
+        self.speed = speed
+
+    async def subscribe(self, tickers: Iterable[str]) -> None:
+        return None
+
+    async def unsubscribe(self, tickers: Iterable[str]) -> None:
+        return None
+
+    async def ticks(self) -> AsyncIterator[Tick]:
+        if not self.path.exists():
+            raise LiveFeedError(f"Replay file '{self.path}' does not exist.")
+        previous: Optional[int] = None
+        with self.path.open() as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                try:
+                    tick = _parse_event(json.loads(line))
+                except ValueError:
+                    logger.warning("Skipping malformed replay line: %.200s", line.strip())
+                    continue
+                if tick is None:
+                    continue
+                if self.speed > 0 and previous is not None:
+                    delay = max(0, tick.timestamp - previous) / 1000 / self.speed
+                    await asyncio.sleep(delay)
+                else:
+                    await asyncio.sleep(0)
+                previous = tick.timestamp
+                yield tick
+
+
+class PolygonFeed:
+    def __init__(self, url: str, channel: str, api_key: Optional[str]) -> None:
+        if not api_key:
+            raise LiveFeedError("POLYGON_API_KEY is not set.")
+        self.url = url
+        self.channel = channel
+        self.api_key = api_key
+        self.tickers: Set[str] = set()
+        self._socket: Any = None
+
+    def _params(self, tickers: Iterable[str]) -> str:
+        return ",".join(f"{self.channel}.{ticker}" for ticker in sorted(tickers))
+
+    async def _send(self, action: str, tickers: Iterable[str]) -> None:
+        if self._socket is not None and tickers:
+            await self._socket.send(
+                json.dumps({"action": action, "params": self._params(tickers)})
+            )
+
+    async def subscribe(self, tickers: Iterable[str]) -> None:
+        tickers = set(tickers) - self.tickers
+        self.tickers |= tickers
+        await self._send("subscribe", tickers)
+
+    async def unsubscribe(self, tickers: Iterable[str]) -> None:
+        tickers = set(tickers) & self.tickers
+        self.tickers -= tickers
+        await self._send("unsubscribe", tickers)
+
+    async def ticks(self) -> AsyncIterator[Tick]:
+        import websockets
+
+        while True:
+            try:
+                async with websockets.connect(self.url) as socket:
+                    await socket.send(
+                        json.dumps({"action": "auth", "params": self.api_key})
+                    )
+                    self._socket = socket
+                    await self._send("subscribe", self.tickers)
+                    async for raw in socket:
+                        try:
+                            events = json.loads(raw)
+                        except ValueError:
+                            logger.warning("Skipping malformed live frame: %.200s", raw)
+                            continue
+                        if not isinstance(events, list):
+                            events = [events]
+                        for event in events:
+                            tick = _parse_event(event)
+                            if tick is not None:
+                                yield tick
+            except (OSError, websockets.WebSocketException) as exc:
+                logger.warning("Live feed disconnected: %s", exc)
+            finally:
+                self._socket = None
+            await asyncio.sleep(1)
+
+
+def _parse_event(event: Any) -> Optional[Tick]:
+    if not isinstance(event, dict):
+        return None
+    ticker = event.get("sym") or event.get("ticker")
+    price = event.get("p", event.get("c"))
+    timestamp = event.get("t", event.get("e", event.get("s")))
+    if not ticker or price is None or timestamp is None:
+        return None
+    try:
+        return Tick(
+            ticker=str(ticker).upper(), price=float(price), timestamp=int(timestamp)
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+class LiveHub:
+    def __init__(self, feed: Any) -> None:
+        self.feed = feed
+        self.metrics: Dict[str, OnlineTickerMetrics] = {}
+        self.subscribers: Dict[str, Set[Subscriber]] = {}
+
+    async def _seed(self, ticker: str) -> OnlineTickerMetrics:
+        try:
+            aggregates = await asyncio.to_thread(get_daily_aggregates, ticker)
+        except PolygonError as exc:
+            logger.warning("Live metrics for %s start without history: %s", ticker, exc)
+            aggregates = []
+        return OnlineTickerMetrics.from_aggregates(aggregates)
+
+    async def subscribe(self, subscriber: Subscriber, tickers: Iterable[str]) -> None:
+        requested = sorted({t.strip().upper() for t in tickers if t.strip()})
+        # Register before seeding so a concurrent unsubscribe by another socket
+        # cannot drop metrics for a ticker this subscriber is about to read.
+        new: List[str] = []
+        for ticker in requested:
+            if ticker not in self.subscribers:
+                self.subscribers[ticker] = set()
+                new.append(ticker)
+            self.subscribers[ticker].add(subscriber)
+            subscriber.tickers.add(ticker)
+
+        missing = [ticker for ticker in requested if ticker not in self.metrics]
+        seeded = await asyncio.gather(*(self._seed(ticker) for ticker in missing))
+        for ticker, metrics in zip(missing, seeded):
+            if ticker in self.subscribers:
+                self.metrics.setdefault(ticker, metrics)
+
+        for ticker in requested:
+            metrics = self.metrics.get(ticker)
+            snapshot = metrics.snapshot() if metrics is not None else {}
+            if snapshot:
+                subscriber.push({"ticker": ticker, "metrics": snapshot})
+        await self.feed.subscribe(new)
+
+    async def unsubscribe(self, subscriber: Subscriber, tickers: Iterable[str]) -> None:
+        idle: List[str] = []
+        for ticker in {t.strip().upper() for t in tickers} & subscriber.tickers:
+            subscriber.tickers.discard(ticker)
+            listeners = self.subscribers.get(ticker)
+            if listeners is None:
+                continue
+            listeners.discard(subscriber)
+            if not listeners:
+                del self.subscribers[ticker]
+                self.metrics.pop(ticker, None)
+                idle.append(ticker)
+        await self.feed.unsubscribe(idle)
+
+    async def remove(self, subscriber: Subscriber) -> None:
+        await self.unsubscribe(subscriber, list(subscriber.tickers))
+
+    def on_tick(self, tick: Tick) -> None:
+        metrics = self.metrics.get(tick.ticker)
+        listeners = self.subscribers.get(tick.ticker)
+        if metrics is None or not listeners:
+            return
+        metrics.update(tick.price, tick.timestamp)
+        message = {"ticker": tick.ticker, "metrics": metrics.snapshot()}
+        for subscriber in listeners:
+            subscriber.push(message)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                async for tick in self.feed.ticks():
+                    self.on_tick(tick)
+            except LiveFeedError as exc:
+                logger.error("Live feed stopped: %s", exc)
+                return
+            except Exception:
+                logger.exception(
+                    "Live feed failed; restarting in %.0fs", FEED_RESTART_SECONDS
+                )
+                await asyncio.sleep(FEED_RESTART_SECONDS)
+                continue
+            logger.info("Live feed finished.")
+            return
+
+
+_hub: Optional[LiveHub] = None
+
+
+def get_live_hub() -> Optional[LiveHub]:
+    return _hub
+
+
+def create_live_hub() -> Optional[LiveHub]:
+    global _hub
+    if LIVE_FEED == "replay":
+        if not LIVE_REPLAY_PATH:
+            raise LiveFeedError("LIVE_REPLAY_PATH is required for the replay feed.")
+        _hub = LiveHub(ReplayFeed(LIVE_REPLAY_PATH, speed=LIVE_REPLAY_SPEED))
+    elif LIVE_FEED == "polygon":
+        _hub = LiveHub(
+            PolygonFeed(LIVE_POLYGON_WS_URL, LIVE_POLYGON_CHANNEL, POLYGON_API_KEY)
+        )
+    elif LIVE_FEED:
+        raise LiveFeedError(
+            f"Unknown LIVE_FEED '{LIVE_FEED}'; use 'polygon' or 'replay'."
+        )
+    return _hub
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 import numpy as np
 import pandas as pd
@@ -69,5 +69,136 @@ def compute_metrics(
     for key in ["market_cap", "pe_ratio", "eps", "dividend_yield"]:
         if fundamentals.get(key) is not None:
             metrics[key] = fundamentals.get(key)
+    eps_ttm = _safe_float(fundamentals.get("eps_ttm"))
+    if "pe_ratio" not in metrics and last_close and eps_ttm and eps_ttm > 0:
+        metrics["pe_ratio"] = last_close / eps_ttm
 
     return {k: v for k, v in metrics.items() if v is not None}
+
+
+TRADING_DAYS_PER_YEAR = 252
+MS_PER_DAY = 86_400_000
+
+
+class RunningMoments:
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def add_batch(self, values: np.ndarray) -> None:
+        count = len(values)
+        if count == 0:
+            return
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+        total = self.count + count
+        delta = batch_mean - self.mean
+        self.m2 += batch_m2 + delta * delta * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+
+    @property
+    def variance(self) -> Optional[float]:
+        if self.count < 2:
+            return None
+        return self.m2 / (self.count - 1)
+
+
+class RunningBarMetrics:
+    def __init__(self) -> None:
+        self.bar_count = 0
+        self.day_count = 0
+        self.first_close: Optional[float] = None
+        self.last_close: Optional[float] = None
+        self.last_day: Optional[int] = None
+        self.peak: Optional[float] = None
+        self.max_drawdown = 0.0
+        self.notional = 0.0
+        self.volume = 0.0
+        self.returns = RunningMoments()
+
+    def add_page(self, bars: List[Dict[str, Any]]) -> None:
+        closes = np.array([_safe_float(bar.get("c")) for bar in bars], dtype=np.float64)
+        valid = ~np.isnan(closes)
+        if not valid.any():
+            return
+        closes = closes[valid]
+        volumes = np.array(
+            [_safe_float(bar.get("v")) for bar in bars], dtype=np.float64
+        )[valid]
+        vwaps = np.array(
+            [_safe_float(bar.get("vw", bar.get("c"))) for bar in bars], dtype=np.float64
+        )[valid]
+        days = np.array(
+            [(_safe_float(bar.get("t")) or 0.0) // MS_PER_DAY for bar in bars],
+            dtype=np.float64,
+        )[valid]
+
+        if self.last_close is None:
+            series = closes
+        else:
+            series = np.concatenate(([self.last_close], closes))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = series[1:] / series[:-1] - 1
+        self.returns.add_batch(returns[np.isfinite(returns)])
+
+        peaks = np.maximum.accumulate(
+            closes if self.peak is None else np.maximum(closes, self.peak)
+        )
+        drawdown = float((closes / peaks - 1).min())
+        self.max_drawdown = min(self.max_drawdown, drawdown)
+        self.peak = float(peaks[-1])
+
+        traded = ~np.isnan(volumes) & ~np.isnan(vwaps)
+        self.notional += float((vwaps[traded] * volumes[traded]).sum())
+        self.volume += float(volumes[traded].sum())
+
+        day_changes = np.count_nonzero(np.diff(days)) + 1
+        if self.last_day is not None and days[0] == self.last_day:
+            day_changes -= 1
+        self.day_count += int(day_changes)
+        self.last_day = int(days[-1])
+
+        if self.first_close is None:
+            self.first_close = float(closes[0])
+        self.last_close = float(closes[-1])
+        self.bar_count += len(closes)
+
+    def as_dict(self) -> Dict[str, Any]:
+        if self.bar_count == 0:
+            return {}
+
+        volatility = None
+        if self.returns.variance is not None and self.day_count:
+            bars_per_year = TRADING_DAYS_PER_YEAR * self.bar_count / self.day_count
+            volatility = float(np.sqrt(self.returns.variance * bars_per_year))
+
+        period_return = None
+        if self.first_close:
+            period_return = self.last_close / self.first_close - 1
+
+        metrics: Dict[str, Any] = {
+            "bar_count": self.bar_count,
+            "first_close": self.first_close,
+            "last_close": self.last_close,
+            "period_return": period_return,
+            "volatility_annualized": volatility,
+            "max_drawdown": self.max_drawdown,
+            "vwap": self.notional / self.volume if self.volume else None,
+            "total_volume": self.volume or None,
+        }
+        return {k: v for k, v in metrics.items() if v is not None}
+
+
+def compute_streaming_metrics(pages: Iterable[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    running = RunningBarMetrics()
+    for page in pages:
+        running.add_page(page)
+    return running.as_dict()
@@ -1,12 +1,23 @@
 from __future__ import annotations
 
+from collections import OrderedDict, deque
 from dataclasses import dataclass
 from datetime import date, timedelta
-from typing import Any, Dict, List, Optional
-
-from app.core.config import POLYGON_API_KEY
+from threading import Lock
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import (
+    BAR_CACHE_MAX_TICKERS,
+    BAR_CACHE_TTL_SECONDS,
+    POLYGON_API_KEY,
+    POLYGON_TIMEOUT_SECONDS,
+)
+from app.core.deadline import DeadlineExceededError, expired, stage_timeout
 
 POLYGON_BASE_URL = "https://api.polygon.io"
+AGGREGATE_TIMESPANS = ("minute", "hour", "day")
+AGGREGATE_PAGE_LIMIT = 50000
 
 
 class PolygonError(Exception):
@@ -29,10 +40,18 @@ def _request_json(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[st
         raise PolygonError("POLYGON_API_KEY is not set.")
     import requests
 
-    url = f"{POLYGON_BASE_URL}{path}"
+    url = path if path.startswith("http") else f"{POLYGON_BASE_URL}{path}"
     params = params or {}
     params["apiKey"] = POLYGON_API_KEY
-    response = requests.get(url, params=params, timeout=20)
+    timeout = stage_timeout(POLYGON_TIMEOUT_SECONDS, "Polygon request")
+    try:
+        response = requests.get(url, params=params, timeout=timeout)
+    except requests.Timeout as exc:
+        if expired():
+            raise DeadlineExceededError(
+                "Deadline reached during Polygon request."
+            ) from exc
+        raise PolygonError(f"Polygon request timed out after {timeout:.0f}s.") from exc
     if response.status_code != 200:
         raise PolygonError(
             f"Polygon request failed ({response.status_code}): {response.text}"
@@ -57,51 +76,97 @@ def fetch_company_details(ticker: str) -> Dict[str, Any]:
     return {k: v for k, v in company.items() if v is not None}
 
 
-def fetch_daily_aggregates(ticker: str, trading_days: int = 180) -> List[Dict[str, Any]]:
-    end_date = date.today()
-    start_date = end_date - timedelta(days=max(270, trading_days * 2))
-    data = _request_json(
-        f"/v2/aggs/ticker/{ticker}/range/1/day/{start_date}/{end_date}",
+def iter_result_pages(
+    path: str, params: Optional[Dict[str, Any]] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    data = _request_json(path, params=params)
+    while True:
+        results = data.get("results")
+        if results:
+            yield results
+        next_url = data.get("next_url")
+        if not next_url:
+            return
+        data = _request_json(next_url)
+
+
+def iter_aggregate_pages(
+    ticker: str,
+    start_date: date,
+    end_date: date,
+    timespan: str = "day",
+    multiplier: int = 1,
+) -> Iterator[List[Dict[str, Any]]]:
+    if timespan not in AGGREGATE_TIMESPANS:
+        raise PolygonError(
+            f"Unsupported timespan '{timespan}'; "
+            f"use one of {', '.join(AGGREGATE_TIMESPANS)}."
+        )
+    yield from iter_result_pages(
+        f"/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{start_date}/{end_date}",
         params={
             "adjusted": "true",
             "sort": "asc",
-            "limit": 50000,
+            "limit": AGGREGATE_PAGE_LIMIT,
         },
     )
-    results = data.get("results")
+
+
+def iter_aggregates(
+    ticker: str,
+    start_date: date,
+    end_date: date,
+    timespan: str = "day",
+    multiplier: int = 1,
+) -> Iterator[Dict[str, Any]]:
+    for page in iter_aggregate_pages(ticker, start_date, end_date, timespan, multiplier):
+        yield from page
+
+
+def fetch_daily_aggregates(ticker: str, trading_days: int = 180) -> List[Dict[str, Any]]:
+    end_date = date.today()
+    start_date = end_date - timedelta(days=max(270, trading_days * 2))
+    results = deque(iter_aggregates(ticker, start_date, end_date), maxlen=trading_days)
     if not results:
         raise TickerNotFoundError(
             f"No aggregate data found for ticker '{ticker}'."
         )
-    return results[-trading_days:]
+    return list(results)
 
 
-def fetch_latest_financials(ticker: str) -> Optional[Dict[str, Any]]:
-    try:
-        data = _request_json(
-            "/vX/reference/financials",
-            params={"ticker": ticker, "limit": 1, "sort": "filing_date", "order": "desc"},
-        )
-    except PolygonError:
-        return None
+_bar_cache: "OrderedDict[str, Tuple[float, int, List[Dict[str, Any]]]]" = OrderedDict()
+_bar_cache_lock = Lock()
 
-    results = data.get("results")
-    if not results:
-        return None
-
-    result = results[0]
-    metrics = result.get("metrics") or {}
-    financials = {
-        "market_cap": result.get("market_cap") or metrics.get("market_cap"),
-        "pe_ratio": metrics.get("price_to_earnings_ratio"),
-        "eps": metrics.get("earnings_per_share"),
-        "dividend_yield": metrics.get("dividend_yield"),
-    }
-    return {k: v for k, v in financials.items() if v is not None}
+
+def get_daily_aggregates(ticker: str, trading_days: int = 180) -> List[Dict[str, Any]]:
+    ticker = ticker.upper()
+    with _bar_cache_lock:
+        entry = _bar_cache.get(ticker)
+        if entry is not None:
+            fetched_at, window, bars = entry
+            fresh = time.monotonic() - fetched_at < BAR_CACHE_TTL_SECONDS
+            if fresh and window >= trading_days:
+                _bar_cache.move_to_end(ticker)
+                return bars[-trading_days:]
+
+    bars = fetch_daily_aggregates(ticker, trading_days=trading_days)
+    with _bar_cache_lock:
+        _bar_cache[ticker] = (time.monotonic(), trading_days, bars)
+        _bar_cache.move_to_end(ticker)
+        while len(_bar_cache) > BAR_CACHE_MAX_TICKERS:
+            _bar_cache.popitem(last=False)
+    return bars
 
 
 def fetch_polygon_data(ticker: str) -> PolygonData:
+    from app.services.financials import get_financial_record
+
     company = fetch_company_details(ticker)
-    aggregates = fetch_daily_aggregates(ticker)
-    financials = fetch_latest_financials(ticker)
-    return PolygonData(company=company, aggregates=aggregates, financials=financials)
+    aggregates = get_daily_aggregates(ticker)
+    financials = dict(get_financial_record(ticker) or {})
+    # Ticker details carry the current market cap; filings only the one at filing.
+    if company.get("market_cap") is not None:
+        financials["market_cap"] = company["market_cap"]
+    return PolygonData(
+        company=company, aggregates=aggregates, financials=financials or None
+    )
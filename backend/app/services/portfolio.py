@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import PORTFOLIO_WORKERS
+from app.services.metrics import MS_PER_DAY, TRADING_DAYS_PER_YEAR, _safe_float
+from app.services.polygon import PolygonError, get_daily_aggregates
+
+MAX_FILL_DAYS = 5
+MIN_OBSERVATIONS = 20
+MIN_COVERAGE = 0.9
+
+
+class PortfolioError(Exception):
+    pass
+
+
+logger = logging.getLogger(__name__)
+
+
+def _fetch_bars(ticker: str, trading_days: int) -> Optional[List[Dict[str, Any]]]:
+    try:
+        return get_daily_aggregates(ticker, trading_days=trading_days)
+    except PolygonError as exc:
+        logger.warning("Portfolio skipped %s: %s", ticker, exc)
+        return None
+
+
+def _bar_arrays(bars: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    days = np.fromiter(
+        (int(bar.get("t") or 0) // MS_PER_DAY for bar in bars),
+        dtype=np.int64,
+        count=len(bars),
+    )
+    closes = np.fromiter(
+        (_safe_float(bar.get("c")) or np.nan for bar in bars),
+        dtype=np.float64,
+        count=len(bars),
+    )
+    valid = ~np.isnan(closes) & (days > 0)
+    return days[valid], closes[valid]
+
+
+def load_aligned_closes(
+    tickers: Sequence[str], trading_days: int
+) -> Tuple[pd.DataFrame, List[str]]:
+    with ThreadPoolExecutor(max_workers=max(1, PORTFOLIO_WORKERS)) as pool:
+        fetched = list(pool.map(lambda t: _fetch_bars(t, trading_days), tickers))
+
+    columns: List[str] = []
+    arrays: List[Tuple[np.ndarray, np.ndarray]] = []
+    missing: List[str] = []
+    for ticker, bars in zip(tickers, fetched):
+        days, closes = _bar_arrays(bars or [])
+        if days.size == 0:
+            missing.append(ticker)
+            continue
+        columns.append(ticker)
+        arrays.append((days, closes))
+    if not columns:
+        return pd.DataFrame(), missing
+
+    calendar = np.unique(np.concatenate([days for days, _ in arrays]))
+    matrix = np.full((len(calendar), len(columns)), np.nan)
+    for column, (days, closes) in enumerate(arrays):
+        matrix[np.searchsorted(calendar, days), column] = closes
+    closes = pd.DataFrame(matrix, index=calendar, columns=columns)
+    closes = closes.ffill(limit=MAX_FILL_DAYS).tail(trading_days)
+    # A short-history name would otherwise truncate every other position to its
+    # own window, so names covering too little of the lookback are set aside.
+    coverage = closes.notna().mean()
+    short = [ticker for ticker in columns if coverage[ticker] < MIN_COVERAGE]
+    if short:
+        logger.warning("Portfolio skipped short histories: %s", ", ".join(short))
+        missing.extend(short)
+        closes = closes.drop(columns=short)
+    return closes.dropna(), missing
+
+
+def _day_to_date(day: int) -> date:
+    return date(1970, 1, 1) + timedelta(days=int(day))
+
+
+def compute_portfolio_risk(
+    closes: pd.DataFrame, weights: np.ndarray, confidence: float = 0.95
+) -> Dict[str, Any]:
+    prices = closes.to_numpy(dtype=np.float64)
+    if len(prices) <= MIN_OBSERVATIONS:
+        raise PortfolioError(
+            f"Need more than {MIN_OBSERVATIONS} aligned trading days; got {len(prices)}."
+        )
+    returns = prices[1:] / prices[:-1] - 1
+
+    covariance = np.atleast_2d(np.cov(returns, rowvar=False)) * TRADING_DAYS_PER_YEAR
+    volatilities = np.sqrt(np.diag(covariance))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = covariance / np.outer(volatilities, volatilities)
+    correlation = np.nan_to_num(correlation)
+
+    portfolio_volatility = float(np.sqrt(max(weights @ covariance @ weights, 0.0)))
+    if portfolio_volatility > 0:
+        marginal = covariance @ weights / portfolio_volatility
+    else:
+        marginal = np.zeros_like(weights)
+    contributions = weights * marginal
+
+    portfolio_returns = returns @ weights
+    cutoff = float(np.quantile(portfolio_returns, 1 - confidence))
+    tail = portfolio_returns[portfolio_returns <= cutoff]
+    equity = np.cumprod(1 + portfolio_returns)
+    drawdown = equity / np.maximum.accumulate(np.maximum(equity, 1.0)) - 1
+
+    return {
+        "observations": len(returns),
+        "volatility_annualized": portfolio_volatility,
+        "var": -cutoff,
+        "cvar": float(-tail.mean()) if tail.size else -cutoff,
+        "max_drawdown": float(min(drawdown.min(), 0.0)),
+        "volatilities": volatilities,
+        "marginal_risk": marginal,
+        "risk_contributions": contributions,
+        "covariance": covariance,
+        "correlation": correlation,
+    }
+
+
+def analyze_portfolio(
+    positions: Dict[str, float],
+    lookback_days: int = 252,
+    confidence: float = 0.95,
+) -> Dict[str, Any]:
+    closes, missing = load_aligned_closes(list(positions), lookback_days + 1)
+    if closes.empty:
+        raise PortfolioError("No price history available for the requested tickers.")
+
+    tickers = list(closes.columns)
+    raw_weights = np.array([positions[ticker] for ticker in tickers], dtype=np.float64)
+    total = raw_weights.sum()
+    if total == 0:
+        raise PortfolioError("Portfolio weights must not sum to zero.")
+    weights = raw_weights / total
+
+    risk = compute_portfolio_risk(closes, weights, confidence=confidence)
+    volatility = risk["volatility_annualized"]
+    contributions = [
+        {
+            "ticker": ticker,
+            "weight": float(weights[i]),
+            "volatility_annualized": float(risk["volatilities"][i]),
+            "marginal_risk": float(risk["marginal_risk"][i]),
+            "risk_contribution": float(risk["risk_contributions"][i]),
+            "pct_contribution": (
+                float(risk["risk_contributions"][i] / volatility) if volatility else 0.0
+            ),
+        }
+        for i, ticker in enumerate(tickers)
+    ]
+    return {
+        "tickers": tickers,
+        "missing": missing,
+        "start_date": _day_to_date(closes.index[0]).isoformat(),
+        "end_date": _day_to_date(closes.index[-1]).isoformat(),
+        "observations": risk["observations"],
+        "confidence": confidence,
+        "volatility_annualized": volatility,
+        "var": risk["var"],
+        "cvar": risk["cvar"],
+        "max_drawdown": risk["max_drawdown"],
+        "contributions": contributions,
+        "covariance": np.round(risk["covariance"], 8).tolist(),
+        "correlation": np.round(risk["correlation"], 6).tolist(),
+        "as_of": datetime.now(timezone.utc).isoformat(),
+    }
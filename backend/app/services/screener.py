@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import SCREENER_REFRESH_UTC, SCREENER_UNIVERSE, SCREENER_WORKERS
+from app.services.financials import RATIO_FIELDS, get_financial_record
+from app.services.metrics import compute_metrics
+from app.services.polygon import PolygonError, get_daily_aggregates
+
+METRIC_COLUMNS = (
+    "last_close",
+    "return_1m",
+    "return_3m",
+    "return_6m",
+    "volatility_annualized",
+    "max_drawdown",
+    "avg_daily_volume",
+    "pe_ratio",
+) + RATIO_FIELDS
+
+
+class ScreenerError(Exception):
+    pass
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ColumnIndex:
+    values: np.ndarray
+    order: np.ndarray
+    sorted_values: np.ndarray
+
+
+@dataclass
+class ScreenPage:
+    total: int
+    rows: List[Tuple[str, Dict[str, float]]]
+
+
+def _build_index(values: np.ndarray) -> ColumnIndex:
+    present = np.flatnonzero(~np.isnan(values))
+    order = present[np.argsort(values[present], kind="stable")]
+    return ColumnIndex(values=values, order=order, sorted_values=values[order])
+
+
+class MetricsTable:
+    def __init__(
+        self,
+        tickers: Sequence[str],
+        columns: Dict[str, np.ndarray],
+        as_of: Optional[str] = None,
+    ) -> None:
+        self.tickers = np.asarray(tickers, dtype=object)
+        self.as_of = as_of
+        self.indexes = {name: _build_index(values) for name, values in columns.items()}
+
+    @classmethod
+    def from_rows(
+        cls, rows: Dict[str, Dict[str, Any]], as_of: Optional[str] = None
+    ) -> "MetricsTable":
+        tickers = sorted(rows)
+        columns = {
+            name: np.array(
+                [_to_float(rows[ticker].get(name)) for ticker in tickers], dtype=np.float64
+            )
+            for name in METRIC_COLUMNS
+        }
+        return cls(tickers, columns, as_of=as_of)
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.indexes)
+
+    def _index(self, column: str) -> ColumnIndex:
+        index = self.indexes.get(column)
+        if index is None:
+            raise ScreenerError(f"Unknown screener field '{column}'.")
+        return index
+
+    def range_mask(
+        self,
+        column: str,
+        low: Optional[float] = None,
+        high: Optional[float] = None,
+        low_inclusive: bool = True,
+        high_inclusive: bool = True,
+    ) -> np.ndarray:
+        index = self._index(column)
+        start = 0
+        stop = len(index.sorted_values)
+        if low is not None:
+            side = "left" if low_inclusive else "right"
+            start = int(np.searchsorted(index.sorted_values, low, side=side))
+        if high is not None:
+            side = "right" if high_inclusive else "left"
+            stop = int(np.searchsorted(index.sorted_values, high, side=side))
+        mask = np.zeros(len(self.tickers), dtype=bool)
+        if stop > start:
+            mask[index.order[start:stop]] = True
+        return mask
+
+    def predicate_mask(
+        self, column: str, op: str, value: float, value_to: Optional[float] = None
+    ) -> np.ndarray:
+        if op == "lt":
+            return self.range_mask(column, high=value, high_inclusive=False)
+        if op == "lte":
+            return self.range_mask(column, high=value)
+        if op == "gt":
+            return self.range_mask(column, low=value, low_inclusive=False)
+        if op == "gte":
+            return self.range_mask(column, low=value)
+        if op == "eq":
+            return self.range_mask(column, low=value, high=value)
+        if op == "between":
+            if value_to is None:
+                raise ScreenerError("'between' predicates require value_to.")
+            return self.range_mask(
+                column, low=min(value, value_to), high=max(value, value_to)
+            )
+        raise ScreenerError(f"Unsupported screener operator '{op}'.")
+
+    def query(
+        self,
+        predicates: Sequence[Tuple[str, str, float, Optional[float]]] = (),
+        sort_by: Optional[str] = None,
+        descending: bool = True,
+        offset: int = 0,
+        limit: int = 50,
+    ) -> ScreenPage:
+        mask = np.ones(len(self.tickers), dtype=bool)
+        for column, op, value, value_to in predicates:
+            mask &= self.predicate_mask(column, op, value, value_to)
+
+        if sort_by:
+            index = self._index(sort_by)
+            order = index.order[::-1] if descending else index.order
+            # Rows without a value for the sort field go last, so total still
+            # matches the rows that can be paged through.
+            unsorted = np.flatnonzero(mask & np.isnan(index.values))
+            ranked = np.concatenate([order[mask[order]], unsorted])
+        else:
+            ranked = np.flatnonzero(mask)
+
+        page = ranked[offset : offset + limit]
+        rows = [(str(self.tickers[row]), self.row(row)) for row in page]
+        return ScreenPage(total=int(mask.sum()), rows=rows)
+
+    def row(self, position: int) -> Dict[str, float]:
+        row: Dict[str, float] = {}
+        for name, index in self.indexes.items():
+            value = index.values[position]
+            if not np.isnan(value):
+                row[name] = float(value)
+        return row
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+_table = MetricsTable.from_rows({})
+
+
+def get_metrics_table() -> MetricsTable:
+    return _table
+
+
+def _compute_ticker_metrics(ticker: str) -> Optional[Dict[str, Any]]:
+    try:
+        aggregates = get_daily_aggregates(ticker)
+        financials = get_financial_record(ticker) or {}
+        return {**financials, **compute_metrics(aggregates, financials)}
+    except PolygonError as exc:
+        logger.warning("Screener skipped %s: %s", ticker, exc)
+    except Exception:
+        # One bad symbol must not abort the refresh for the whole universe.
+        logger.exception("Screener skipped %s", ticker)
+    return None
+
+
+def refresh_metrics_table(tickers: Optional[Sequence[str]] = None) -> MetricsTable:
+    global _table
+    universe = sorted({t.upper() for t in (tickers or SCREENER_UNIVERSE)})
+    if not universe:
+        raise ScreenerError("Screener universe is empty; set SCREENER_UNIVERSE.")
+
+    start = time.perf_counter()
+    logger.info("Screener refresh start: %d tickers", len(universe))
+    with ThreadPoolExecutor(max_workers=max(1, SCREENER_WORKERS)) as pool:
+        computed = dict(zip(universe, pool.map(_compute_ticker_metrics, universe)))
+    rows = {ticker: metrics for ticker, metrics in computed.items() if metrics}
+
+    table = MetricsTable.from_rows(rows, as_of=datetime.now(timezone.utc).isoformat())
+    _table = table
+    logger.info(
+        "Screener refresh done: %d/%d tickers (%.2fs)",
+        len(table),
+        len(universe),
+        time.perf_counter() - start,
+    )
+    return table
+
+
+def _seconds_until_refresh(now: datetime) -> float:
+    hour, minute = (int(part) for part in SCREENER_REFRESH_UTC.split(":", 1))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+async def run_refresh_schedule() -> None:
+    delay = 0.0
+    while True:
+        await asyncio.sleep(delay)
+        delay = _seconds_until_refresh(datetime.now(timezone.utc))
+        try:
+            await asyncio.to_thread(refresh_metrics_table)
+        except Exception:
+            logger.exception("Screener refresh failed")
+            delay = min(delay, 300.0)
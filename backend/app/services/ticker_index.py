@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_left
+from datetime import datetime, timezone
+import json
+import logging
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.config import DATA_DIR, TICKER_INDEX_REFRESH_HOURS
+from app.services.polygon import PolygonError, iter_result_pages
+
+INDEX_PATH = DATA_DIR / "tickers.json"
+TICKERS_PAGE_LIMIT = 1000
+PREFIX_SENTINEL = "￿"
+
+logger = logging.getLogger(__name__)
+
+
+def _name_tokens(name: str) -> List[str]:
+    lowered = name.lower()
+    tokens = {lowered}
+    tokens.update(re.findall(r"[a-z0-9]+", lowered))
+    return sorted(tokens)
+
+
+def _prefix_range(keys: Sequence[str], prefix: str) -> Tuple[int, int]:
+    start = bisect_left(keys, prefix)
+    stop = bisect_left(keys, prefix + PREFIX_SENTINEL, lo=start)
+    return start, stop
+
+
+class TickerIndex:
+    def __init__(
+        self, rows: Iterable[Sequence[str]] = (), built_at: Optional[str] = None
+    ) -> None:
+        unique = {row[0].upper(): row for row in rows if row and row[0]}
+        ordered = sorted(unique.items())
+        self.built_at = built_at
+        self.symbols = [symbol for symbol, _ in ordered]
+        self.names = [row[1] if len(row) > 1 else "" for _, row in ordered]
+        self.exchanges = [row[2] if len(row) > 2 else "" for _, row in ordered]
+        self._positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+        tokens = sorted(
+            (token, position)
+            for position, name in enumerate(self.names)
+            for token in _name_tokens(name)
+        )
+        self._token_keys = [token for token, _ in tokens]
+        self._token_positions = [position for _, position in tokens]
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol.upper() in self._positions
+
+    def _entry(self, position: int) -> Dict[str, str]:
+        return {
+            "ticker": self.symbols[position],
+            "name": self.names[position],
+            "exchange": self.exchanges[position],
+        }
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, str]]:
+        query = query.strip()
+        if not query or limit <= 0:
+            return []
+        positions: List[int] = []
+        start, stop = _prefix_range(self.symbols, query.upper())
+        positions.extend(range(start, min(stop, start + limit)))
+        if len(positions) < limit:
+            seen = set(positions)
+            start, stop = _prefix_range(self._token_keys, query.lower())
+            for position in self._token_positions[start:stop]:
+                if position not in seen:
+                    seen.add(position)
+                    positions.append(position)
+                    if len(positions) >= limit:
+                        break
+        return [self._entry(position) for position in positions]
+
+
+_index = TickerIndex()
+
+
+def get_ticker_index() -> TickerIndex:
+    return _index
+
+
+def _download_rows() -> List[List[str]]:
+    rows: List[List[str]] = []
+    params: Dict[str, Any] = {
+        "market": "stocks",
+        "active": "true",
+        "sort": "ticker",
+        "order": "asc",
+        "limit": TICKERS_PAGE_LIMIT,
+    }
+    for page in iter_result_pages("/v3/reference/tickers", params=params):
+        for result in page:
+            if result.get("ticker"):
+                rows.append(
+                    [
+                        result["ticker"],
+                        result.get("name") or "",
+                        result.get("primary_exchange") or "",
+                    ]
+                )
+    return rows
+
+
+def load_ticker_index() -> TickerIndex:
+    global _index
+    if not INDEX_PATH.exists():
+        return _index
+    try:
+        stored = json.loads(INDEX_PATH.read_text())
+    except (OSError, json.JSONDecodeError):
+        logger.warning("Ticker index at %s is unreadable.", INDEX_PATH)
+        return _index
+    _index = TickerIndex(stored.get("rows") or [], built_at=stored.get("built_at"))
+    logger.info("Ticker index loaded: %d symbols", len(_index))
+    return _index
+
+
+def refresh_ticker_index() -> TickerIndex:
+    global _index
+    start = time.perf_counter()
+    rows = _download_rows()
+    if not rows:
+        raise PolygonError("Polygon returned no reference tickers.")
+    built_at = datetime.now(timezone.utc).isoformat()
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = INDEX_PATH.with_suffix(".tmp")
+    payload = {"built_at": built_at, "rows": rows}
+    tmp_path.write_text(json.dumps(payload, separators=(",", ":")))
+    tmp_path.replace(INDEX_PATH)
+    _index = TickerIndex(rows, built_at=built_at)
+    logger.info(
+        "Ticker index refreshed: %d symbols (%.2fs)",
+        len(_index),
+        time.perf_counter() - start,
+    )
+    return _index
+
+
+def _seconds_until_refresh() -> float:
+    if not _index.built_at:
+        return 0.0
+    age = datetime.now(timezone.utc) - datetime.fromisoformat(_index.built_at)
+    return max(0.0, TICKER_INDEX_REFRESH_HOURS * 3600 - age.total_seconds())
+
+
+async def run_refresh_schedule() -> None:
+    while True:
+        await asyncio.sleep(_seconds_until_refresh())
+        try:
+            await asyncio.to_thread(refresh_ticker_index)
+        except Exception:
+            logger.exception("Ticker index refresh failed")
+            await asyncio.sleep(300)
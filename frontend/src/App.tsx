@@ -8,6 +8,7 @@ const App = () => {
   const [error, setError] = useState<string>("");
   const [scorecard, setScorecard] = useState<Record<string, unknown> | null>(null);
   const [compilerScorecard, setCompilerScorecard] = useState<Record<string, unknown> | null>(null);
+  const [missing, setMissing] = useState<string[]>([]);
 
   const handleAnalyze = async (ticker: string) => {
     setLoading(true);
@@ -15,6 +16,7 @@ const App = () => {
     setReport("");
     setScorecard(null);
     setCompilerScorecard(null);
+    setMissing([]);
     try {
       const response = await fetch("/api/analyze", {
         method: "POST",
@@ -29,6 +31,7 @@ const App = () => {
       setReport(data.report_markdown || "");
       setScorecard(data.scorecard || null);
       setCompilerScorecard(data.compiler_scorecard || null);
+      setMissing(data.partial ? data.missing || [] : []);
     } catch (err) {
       setError(err instanceof Error ? err.message : "Unexpected error.");
     } finally {
@@ -46,7 +49,12 @@ const App = () => {
         <TickerForm onAnalyze={handleAnalyze} loading={loading} />
         {loading && <div className="loading">Analyzing…</div>}
         {error && <div className="error">{error}</div>}
-        {report && (
+        {missing.length > 0 && (
+          <div className="notice">
+            Partial result: the time budget ran out before {missing.join(", ")} finished.
+          </div>
+        )}
+        {(report || scorecard || compilerScorecard) && (
           <ReportView
             markdown={report}
             scorecard={scorecard}
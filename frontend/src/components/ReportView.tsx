@@ -161,7 +161,7 @@ const ReportView = ({ markdown, scorecard, compilerScorecard }: Props) => {
           )}
         </div>
       )}
-      <ReactMarkdown>{markdown}</ReactMarkdown>
+      {markdown && <ReactMarkdown>{markdown}</ReactMarkdown>}
     </div>
   );
 };
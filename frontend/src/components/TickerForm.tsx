@@ -1,12 +1,49 @@
-import { useState } from "react";
+import { useEffect, useState } from "react";
 
 type Props = {
   onAnalyze: (ticker: string) => void;
   loading: boolean;
 };
 
+type Suggestion = {
+  ticker: string;
+  name: string;
+  exchange: string;
+};
+
+const SUGGESTION_LIMIT = 8;
+const SUGGESTION_DELAY_MS = 150;
+
 const TickerForm = ({ onAnalyze, loading }: Props) => {
   const [ticker, setTicker] = useState("");
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([]);
+
+  useEffect(() => {
+    const query = ticker.trim();
+    if (!query) {
+      setSuggestions([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = window.setTimeout(async () => {
+      try {
+        const params = new URLSearchParams({ q: query, limit: String(SUGGESTION_LIMIT) });
+        const response = await fetch(`/api/tickers/search?${params}`, {
+          signal: controller.signal,
+        });
+        if (response.ok) {
+          const data = await response.json();
+          setSuggestions(data.results as Suggestion[]);
+        }
+      } catch {
+        // Suggestions are best-effort; typing still works without them.
+      }
+    }, SUGGESTION_DELAY_MS);
+    return () => {
+      window.clearTimeout(timer);
+      controller.abort();
+    };
+  }, [ticker]);
 
   const handleSubmit = (event: React.FormEvent) => {
     event.preventDefault();
@@ -25,8 +62,17 @@ const TickerForm = ({ onAnalyze, loading }: Props) => {
           value={ticker}
           onChange={(event) => setTicker(event.target.value)}
           placeholder="AAPL"
+          list="ticker-suggestions"
+          autoComplete="off"
           disabled={loading}
         />
+        <datalist id="ticker-suggestions">
+          {suggestions.map((suggestion) => (
+            <option key={suggestion.ticker} value={suggestion.ticker}>
+              {suggestion.name}
+            </option>
+          ))}
+        </datalist>
         <button type="submit" disabled={loading}>
           Analyze
         </button>